@@ -1,11 +1,44 @@
+import json
+import os
+import tempfile
 import unittest
-from random import seed
+from copy import deepcopy
+from random import random, seed, uniform
 
-from to_trust import LyingMode
-from to_trust.methods import ITEA, Act, Travos  # , MET
-from to_trust.scenarios import HostileEnvironment, StartLying, RecruitWitness, Simple
-from to_trust.testbed import Simulation, Scenario
-from to_trust.agents import Consumer, Provider, Witness, RandomWitness
+import numpy as np
+import pandas as pd
+from scipy import integrate, stats
+
+import to_trust
+from to_trust import LyingMode, benchmark
+from to_trust.methods import ITEA, Act, ArrayAct, Travos  # , MET
+from to_trust.methods.TRAVOS.Travos import beta_mass
+from to_trust.metrics import MetricSystem, normalized_average_utility_leftover
+from to_trust.scenarios import (
+    HostileEnvironment,
+    MultiCollusiveRing,
+    RecruitWitness,
+    Simple,
+    StartLying,
+)
+from to_trust.testbed import ArraySimulation, Simulation, Scenario, outcome_matrix
+from to_trust.testbed.equivalence import (
+    assert_equivalent,
+    assert_statistically_equivalent,
+    compare_engines,
+)
+from to_trust.agents import Consumer, Provider, Witness, RandomWitness, WitnessPool
+from to_trust.agents.witness_pool import uniform_draws
+from to_trust.results import (
+    ResultSink,
+    ResultStore,
+    ResultSummary,
+    RunningStatistics,
+    RunResult,
+    result_frame,
+)
+from to_trust.sweep import Sweep
+from to_trust.util import Profiler, profiler
 
 
 class TestingTravos(unittest.TestCase):
@@ -56,6 +89,116 @@ class TestingTravos(unittest.TestCase):
         self.assertEqual(result_pro, expected_pro)
 
 
+class TestingTravosBetaMass(unittest.TestCase):
+    def test_matches_quadrature(self):
+        for alpha in (1, 2, 7, 40, 300):
+            for beta in (1, 3, 25, 250):
+                for lower, upper in ((-0.1, 0.3), (0.2, 0.4), (0.45, 0.85), (0.8, 1.2)):
+                    expected, _ = integrate.quad(
+                        lambda x: stats.beta.pdf(x, alpha, beta), lower, upper
+                    )
+                    self.assertAlmostEqual(
+                        beta_mass(alpha, beta, lower, upper), expected, delta=1e-8
+                    )
+
+
+class RecordingTravos(Travos):
+    """Travos that keeps every opinion it was given and every outcome, in order"""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.history = []
+        self.opinions = {}
+
+    def choose_provider(self):
+        self.opinions = {}
+        return super().choose_provider()
+
+    def _accuracy_of_witnesses(self, provider):
+        accuracy, expected_value = super()._accuracy_of_witnesses(provider)
+        self.opinions[provider] = expected_value.tolist()
+        return accuracy, expected_value
+
+    def update_provider(self, provider, score):
+        self.history.append((provider, score, dict(self.opinions)))
+        super().update_provider(provider, score)
+
+
+class TestingTravosOutcomeCounts(unittest.TestCase):
+    def test_counts_match_history(self):
+        seed(42)
+        scenario = HostileEnvironment(witness_amount=4, consumer_amount=2, provider_amount=6)
+        sim = Simulation(scenario, RecordingTravos, 40)
+        sim.run()
+        for travos in sim.consumers:
+            intervals = travos._intervals.tolist()
+            bins = len(intervals) - 1
+            providers = list(travos.providers)
+            counts = np.zeros(travos._outcome_counts.shape, dtype=np.int64)
+            asked = 0
+            for provider, score, opinions in travos.history:
+                if provider not in opinions:
+                    continue
+                outcome = score > travos._outcome_threshold
+                for w, opinion in enumerate(opinions[provider]):
+                    below = [k for k in range(bins) if intervals[k] < opinion]
+                    k = min(below[-1], bins - 1) if below else 0
+                    correct = (opinion > travos._outcome_threshold) == outcome
+                    counts[w, providers.index(provider), k, 0 if correct else 1] += 1
+                    asked += 1
+            self.assertGreater(asked, 0)
+            self.assertEqual(travos._outcome_counts.tolist(), counts.tolist())
+
+            last = np.full(travos._last_expected_value.shape, np.nan)
+            for provider, opinion in travos.opinions.items():
+                last[:, providers.index(provider)] = opinion
+            np.testing.assert_array_equal(travos._last_expected_value, last)
+
+
+class TestingTravosStandalone(unittest.TestCase):
+    def test_without_registry(self):
+        seed(42)
+        providers = [Provider() for _ in range(4)]
+        witnesses = [Witness() for _ in range(3)]
+        travos = Travos()
+        travos.register_providers(providers)
+        travos.register_witnesses(witnesses)
+        for w in witnesses:
+            w.register_providers(providers)
+        self.assertIsNone(travos.registry)
+        for step in range(6):
+            chosen = travos.choose_provider()
+            travos.update_provider(chosen, step % 2)
+        positive = travos._positive_outcomes.tolist()
+        travos.update_provider(providers[2], 1.0)
+        positive[2] += 1
+        self.assertEqual(travos._positive_outcomes.tolist(), positive)
+        self.assertEqual(
+            int(travos._positive_outcomes.sum() + travos._negative_outcomes.sum()), 7
+        )
+
+
+class TestingMetrics(unittest.TestCase):
+    def test_vectorized_naul(self):
+        seed(42)
+        epochs = 30
+        consumers = {c: [uniform(-0.5, 1) for _ in range(epochs + 5)] for c in range(4)}
+        providers = {p: [uniform(-0.5, 1) for _ in range(epochs + 5)] for p in range(6)}
+
+        total = 0.0
+        for i in range(epochs):
+            g_min = min([1] + [providers[p][i] for p in providers])
+            g_max = max([-1] + [providers[p][i] for p in providers])
+            for c in consumers:
+                total += (consumers[c][i] - g_min) / (g_max - g_min)
+        expected = 1 - total / (epochs * len(consumers))
+
+        self.assertAlmostEqual(
+            normalized_average_utility_leftover(consumers, providers, epochs), expected
+        )
+        self.assertIn("Naul", MetricSystem._vectorized)
+
+
 class TestingACT(unittest.TestCase):
     def setUp(self) -> None:
         seed(42)
@@ -145,6 +288,894 @@ class TestingACT(unittest.TestCase):
         self.assertEqual(result_con, expected_con)
         self.assertEqual(result_pro, expected_pro)
 
+
+class TestingActNormalizer(unittest.TestCase):
+    def test_pi_stable_for_large_parameters(self):
+        seed(42)
+        providers = [Provider() for _ in range(2)]
+        witnesses = [Witness() for _ in range(4)]
+        act = Act()
+        act.register_providers(providers)
+        act.register_witnesses(witnesses)
+        p = providers[0]
+        for i, w in enumerate(witnesses):
+            act._p[w][p] = 1000.0 + i
+            act._stale_normalizers.add(p)
+        weights = [act._pi(w, p) for w in witnesses]
+        self.assertAlmostEqual(sum(weights), 1.0)
+        self.assertGreater(weights[-1], weights[0])
+        self.assertAlmostEqual(act._pi(witnesses[0], providers[1]), 0.25)
+
+
+class TestingActTheta(unittest.TestCase):
+    def test_counters_match_history(self):
+        seed(42)
+        scenario = HostileEnvironment(
+            witness_amount=4,
+            consumer_amount=2,
+            provider_amount=4,
+            consumer_options={"keep_testimonies": True},
+        )
+        sim = Simulation(scenario, Act, 60)
+        sim.run()
+        checked = 0
+        for act in sim.consumers:
+            for w in act.witnesses:
+                for p in act.providers:
+                    history = act._testimonies[w][p]
+                    self.assertEqual(act._testimony_count[w][p], len(history))
+                    if history:
+                        expected = (1 / len(history)) * sum(
+                            act._d(w, p, t) * (1 - act._O(p, t)) for t in range(len(history))
+                        )
+                        self.assertEqual(act._theta(w, p), expected)
+                        checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_interaction_log(self):
+        seed(42)
+        scenario = HostileEnvironment(witness_amount=3, consumer_amount=1, provider_amount=4)
+        sim = Simulation(scenario, Act, 20)
+        scores, _ = sim.run()
+        act = sim.consumers[0]
+        self.assertEqual(len(act._log), 20)
+        for t in range(20):
+            chosen = [p for p in act.providers if act._D(p, t)]
+            self.assertEqual(len(chosen), 1)
+            self.assertEqual(act._O(chosen[0], t), scores[act][t] >= act._Threshold)
+
+    def test_without_registry(self):
+        for ntcm in [Act, ArrayAct]:
+            seed(42)
+            providers = [Provider() for _ in range(4)]
+            witnesses = [Witness() for _ in range(3)]
+            act = ntcm()
+            act.register_providers(providers)
+            act.register_witnesses(witnesses)
+            for w in witnesses:
+                w.register_providers(providers)
+            self.assertIsNone(act.registry)
+            for step in range(12):
+                chosen = act.choose_provider()
+                act.update_provider(chosen, step % 2)
+                act.update()
+                self.assertTrue(act._D(chosen, step))
+                self.assertEqual(act._O(chosen, step), bool(step % 2))
+            self.assertEqual(len(act._log), 12)
+
+
+class TestingArrayAct(unittest.TestCase):
+    def test_matches_act(self):
+        for mode in [to_trust.TestimonyMode.PerCall, to_trust.TestimonyMode.PerEpoch]:
+            runs = []
+            for ntcm in [Act, ArrayAct]:
+                seed(42)
+                scenario = RecruitWitness(witness_amount=8, consumer_amount=2, provider_amount=6)
+                sim = Simulation(scenario, ntcm, 40, testimony_mode=mode)
+                scores, _ = sim.run()
+                runs.append((list(scores.values()), [c.MAE for c in sim.consumers]))
+            self.assertEqual(runs[0], runs[1])
+
+    def test_reputation_of_matches_reputations(self):
+        seed(42)
+        scenario = HostileEnvironment(witness_amount=5, consumer_amount=1, provider_amount=4)
+        sim = Simulation(scenario, ArrayAct, 15)
+        sim.run()
+        act = sim.consumers[0]
+        seed(0)
+        each = [act._reputation_of(p, 0) for p in act.providers]
+        seed(0)
+        every = act._reputations(act._direct_trusts()).tolist()
+        for a, b in zip(each, every):
+            self.assertAlmostEqual(a, b)
+
+
+class TestingActSelection(unittest.TestCase):
+    def test_top_witnesses_match_sort(self):
+        for ntcm in [Act, ArrayAct]:
+            seed(42)
+            scenario = MultiCollusiveRing(witness_amount=9, consumer_amount=1, provider_amount=5)
+            sim = Simulation(scenario, ntcm, 30)
+            sim.run()
+            act = sim.consumers[0]
+            expected = sorted(act.witnesses, key=act.witnesses.__getitem__, reverse=True)
+            self.assertEqual(act._top_witnesses, expected[: act._Magnitude])
+            for w in act.witnesses:
+                act.witnesses[w] = 0.0
+            act.update_provider(act.choose_provider(), 1.0)
+            expected = sorted(act.witnesses, key=act.witnesses.__getitem__, reverse=True)
+            self.assertEqual(act._top_witnesses, expected[: act._Magnitude])
+
+    def test_witness_rankings_match_sort(self):
+        for ntcm in [Act, ArrayAct]:
+            seed(42)
+            scenario = RecruitWitness(witness_amount=9, consumer_amount=1, provider_amount=5)
+            sim = Simulation(scenario, ntcm, 40)
+            sim.run()
+            act = sim.consumers[0]
+            for p in act.providers:
+                expected = sorted(act.witnesses, key=act._ranking_key(p))
+                self.assertEqual(act._witness_ranking[p], expected)
+
+    def test_provider_partitions_follow_interactions(self):
+        for ntcm in [Act, ArrayAct]:
+            seed(42)
+            scenario = HostileEnvironment(witness_amount=4, consumer_amount=2, provider_amount=12)
+            sim = Simulation(scenario, ntcm, 8)
+            sim.run()
+            for act in sim.consumers:
+                unknown = [p for p in act.providers if act._N(p) == 0]
+                self.assertEqual(act._unknown_providers(), unknown)
+                self.assertEqual(act._known_providers(), [p for p in act.providers if p not in unknown])
+                act._unknown_providers().clear()
+                act._known_providers().clear()
+                self.assertEqual(act._unknown_providers(), unknown)
+                self.assertEqual(len(act._known_providers()), len(act.providers) - len(unknown))
+
+
+class ConfidentAct(Act):
+    """Act with a positive N_min of about 14 interactions, so gamma starts below 1"""
+
+    def __init__(self, **kwargs) -> None:
+        # a confidence level below -1 is what makes N_min positive
+        super().__init__(epsilon=0.2, small_theta=-5, **kwargs)
+
+
+class ConfidentArrayAct(ArrayAct):
+    """ArrayAct with the N_min of `ConfidentAct`"""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(epsilon=0.2, small_theta=-5, **kwargs)
+
+
+class TestingActReputationCache(unittest.TestCase):
+    def test_cached_scores_match_reputations(self):
+        seed(42)
+        scenario = RecruitWitness(witness_amount=6, consumer_amount=2, provider_amount=8)
+        sim = Simulation(scenario, Act, 40, testimony_mode=to_trust.TestimonyMode.PerEpoch)
+        sim.run()
+        changed = sim.testimonies.changed_since(sim.testimonies.version - 1)
+        self.assertEqual(len(changed), len(sim.testimonies.changed))
+        self.assertIsNone(sim.testimonies.changed_since(None))
+        for act in sim.consumers:
+            act._exploration_probability = -1
+            act.choose_provider()
+            self.assertEqual(act.testimonies.changed_since(act._testimony_version), [])
+            for p in act.providers:
+                self.assertEqual(act.scores[p], act._reputation_of(p, 0))
+
+    def test_per_call_recomputes_changed_providers(self):
+        seed(42)
+        scenario = RecruitWitness(witness_amount=6, consumer_amount=1, provider_amount=8)
+        sim = Simulation(scenario, Act, 40)
+        sim.run()
+        act = sim.consumers[0]
+        act._exploration_probability = -1
+        recomputed = []
+        reputation_of = act._reputation_of
+        act._reputation_of = lambda p, t, testimonies=None: (
+            recomputed.append(p) or reputation_of(p, t, testimonies)
+        )
+        stale = [p for p in act.providers if p in act._stale_reputations]
+        chosen = act.choose_provider()
+        self.assertEqual(recomputed, stale)
+        recomputed.clear()
+        act.update_provider(chosen, 1.0)
+        act.choose_provider()
+        self.assertEqual(recomputed, [chosen])
+        for p in act.providers:
+            self.assertEqual(act.scores[p], reputation_of(p, 0))
+
+    def test_gamma_below_one(self):
+        for mode in [to_trust.TestimonyMode.PerCall, to_trust.TestimonyMode.PerEpoch]:
+            runs = []
+            for ntcm in [ConfidentAct, ConfidentArrayAct]:
+                seed(42)
+                scenario = RecruitWitness(witness_amount=6, consumer_amount=1, provider_amount=8)
+                sim = Simulation(scenario, ntcm, 80, testimony_mode=mode)
+                scores, _ = sim.run()
+                act = sim.consumers[0]
+                runs.append((list(scores.values()), act.MAE))
+                gammas = [act._gamma(p) for p in act.providers]
+                self.assertIn(1, gammas)
+                self.assertTrue(any(gamma < 1 for gamma in gammas))
+
+                act._exploration_probability = -1
+                act.update_provider(act.choose_provider(), 1.0)
+                stale = [p for p in act.providers if p in act._stale_reputations]
+                indirect = [p for p in act.providers if act._gamma(p) != 1]
+                if mode is to_trust.TestimonyMode.PerCall:
+                    # new testimonies every call: gamma below 1 is recomputed even when not stale
+                    expected = [p for p in act.providers if p in stale or p in indirect]
+                else:
+                    # the witnesses of this scenario are honest, now they lie for these draws
+                    for w in act.witnesses:
+                        w.honesty, w.lying_mode = 0.5, LyingMode.Inverse
+                    sim.testimonies.refresh(np.ones(sim.testimonies.matrix.shape))
+                    changed = act.testimonies.changed_since(act.testimonies.version - 1)
+                    self.assertTrue(set(changed) - set(indirect))
+                    # changed testimonies of a provider with gamma 1 don't change its reputation
+                    recompute = set(stale) | set(indirect) & set(changed)
+                    expected = [p for p in act.providers if p in recompute]
+                recomputed, asked = [], []
+                reputation_of, ask_witnesses = act._reputation_of, act.ask_witnesses
+                act._reputation_of = lambda p, t, testimonies=None: (
+                    recomputed.append(p) or reputation_of(p, t, testimonies)
+                )
+                act.ask_witnesses = lambda witnesses, providers: (
+                    asked.append(list(providers)) or ask_witnesses(witnesses, providers)
+                )
+                act.choose_provider()
+                if mode is to_trust.TestimonyMode.PerCall:
+                    # the witnesses are only asked about the providers with gamma below 1
+                    self.assertEqual(asked[-1], indirect)
+                for p in act.providers:
+                    if p not in indirect:
+                        self.assertEqual(act.scores[p], act._direct_trust(p, 0))
+                    elif mode is to_trust.TestimonyMode.PerEpoch:
+                        self.assertEqual(act.scores[p], reputation_of(p, 0))
+                if ntcm is ConfidentAct:
+                    self.assertEqual(sorted(recomputed, key=act._provider_position.get), expected)
+            self.assertEqual(runs[0], runs[1])
+
+    def test_ask_witnesses_matches_testimony_of(self):
+        seed(42)
+        scenario = MultiCollusiveRing(witness_amount=6, consumer_amount=1, provider_amount=5)
+        sim = Simulation(scenario, Act, 10)
+        sim.run()
+        act = sim.consumers[0]
+        witnesses, providers = list(act.witnesses)[1:], list(act.providers)[::-1]
+        seed(7)
+        asked = act.ask_witnesses(witnesses, providers)
+        seed(7)
+        expected = [[act.testimony_of(w, p) for p in providers] for w in witnesses]
+        self.assertEqual(asked.tolist(), expected)
+
+
+class TestingArraySimulation(unittest.TestCase):
+    def setUp(self) -> None:
+        seed(42)
+        return super().setUp()
+
+    def test_same_shape_as_simulation(self):
+        scenario = HostileEnvironment(
+            witness_amount=5,
+            consumer_amount=3,
+            provider_amount=6,
+            provider_options={"chance": 1, "l_cost": 0.1, "u_cost": 0.3},
+        )
+        _con_ref, _pro_ref = Simulation(scenario, Act, 20).run()
+        _con_scores, _pro_scores = ArraySimulation(scenario, Act, 20).run()
+
+        self.assertEqual(list(_con_scores), list(_con_ref))
+        self.assertEqual(list(_pro_scores), list(_pro_ref))
+        for c in _con_scores:
+            self.assertEqual(len(_con_scores[c]), 20)
+        for p in _pro_scores:
+            self.assertEqual(list(_pro_scores[p]), _pro_ref[p])
+
+    def test_outcome_frequency(self):
+        scenario = Simple(
+            witnesses=[Witness()],
+            providers=[Provider(chance=0.25, quality=1, cost=0)],
+            consumer_amount=1,
+        )
+        sim = ArraySimulation(scenario, Act, 2000, seed=1)
+        _con_scores, _pro_scores = sim.run()
+        self.assertAlmostEqual(sim.true_value_matrix.mean(), 0.25, delta=0.03)
+
+    def test_own_service_providers(self):
+        scenario = Simple(
+            witnesses=[Witness()],
+            providers=[
+                Provider(chance=0.5, quality=1, cost=0),
+                DoublingProvider(chance=0.5, quality=1, cost=0),
+            ],
+            consumer_amount=1,
+        )
+        outcomes = np.linspace(0, 1, 20).reshape(10, 2)
+        _con, expected = Simulation(deepcopy(scenario), Act, 10).run(outcomes=outcomes)
+        _con, values = ArraySimulation(deepcopy(scenario), Act, 10).run(outcomes=outcomes)
+        for p, q in zip(expected, values):
+            self.assertEqual(expected[p], list(values[q]))
+        self.assertTrue(any(v > 1 for v in list(values.values())[1]))
+
+
+class DoublingProvider(Provider):
+    def get_service(self, draw: float | None = None) -> float:
+        return 2 * super().get_service(draw) + 1
+
+
+class TestingCommonRandomNumbers(unittest.TestCase):
+    def test_outcomes_shared_between_engines_and_methods(self):
+        seed(42)
+        scenario = HostileEnvironment(
+            witness_amount=3, consumer_amount=2, provider_amount=4
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            outcomes = outcome_matrix(3, 25, 4, directory)
+            cached = outcome_matrix(3, 25, 4, directory)
+            self.assertEqual(outcomes.tolist(), cached.tolist())
+            self.assertEqual(outcomes.tolist(), outcome_matrix(3, 25, 4).tolist())
+
+            # every method gets its own copy, the scenario caches the consumers it created,
+            # of the same providers and witnesses
+            scenario.get_providers()
+            scenario.get_witnesses()
+            _con, act = Simulation(deepcopy(scenario), Act, 25).run(outcomes=outcomes)
+            _con, array_act = ArraySimulation(deepcopy(scenario), Act, 25).run(
+                outcomes=outcomes
+            )
+            itea_sim = Simulation(deepcopy(scenario), ITEA, 25)
+            itea_con, itea = itea_sim.run(outcomes=outcomes)
+            del outcomes, cached
+        self.assertTrue(all(isinstance(c, ITEA) for c in itea_con))
+        self.assertTrue(all(isinstance(c, ITEA) for c in itea_sim.consumers))
+        for values, itea_values, array_values in zip(
+            act.values(), itea.values(), array_act.values()
+        ):
+            self.assertEqual(values, itea_values)
+            self.assertEqual(values, list(array_values))
+
+
+class CountingWitness(Witness):
+    calls = 0
+
+    def score_of(self, provider: Provider) -> float:
+        CountingWitness.calls += 1
+        return super().score_of(provider)
+
+
+class TestingTestimonyCache(unittest.TestCase):
+    def setUp(self) -> None:
+        seed(42)
+        CountingWitness.calls = 0
+        return super().setUp()
+
+    def test_one_testimony_per_epoch(self):
+        scenario = Simple(
+            witnesses=[CountingWitness(honesty=0.5, bad_mouthing=True) for _ in range(4)],
+            consumer_amount=3,
+            provider_amount=5,
+        )
+        sim = Simulation(scenario, ITEA, 6, testimony_mode=to_trust.TestimonyMode.PerEpoch)
+        sim.run()
+        self.assertEqual(CountingWitness.calls, 6 * 4 * 5)
+
+        consumers = scenario.get_consumers(ITEA)
+        for w in scenario.get_witnesses():
+            for p in scenario.get_providers():
+                testimonies = {c.testimony_of(w, p) for c in consumers}
+                self.assertEqual(len(testimonies), 1)
+
+    def test_per_call_by_default(self):
+        scenario = Simple(
+            witnesses=[CountingWitness() for _ in range(4)],
+            consumer_amount=3,
+            provider_amount=5,
+        )
+        Simulation(scenario, ITEA, 6).run()
+        self.assertEqual(CountingWitness.calls, 2 * 3 * 6 * 4 * 5)
+
+
+class TestingWitnessPool(unittest.TestCase):
+    def test_uniform_draws_follow_random(self):
+        for n in (0, 1, 5, 1000):
+            seed(n)
+            draws = uniform_draws(n).tolist()
+            after = random()
+            seed(n)
+            self.assertEqual(draws, [random() for _ in range(n)])
+            self.assertEqual(after, random())
+
+    def test_same_testimonies_as_witnesses(self):
+        seed(42)
+        providers = [Provider() for _ in range(6)]
+        witnesses = []
+        for mode in LyingMode:
+            for honesty in (0, 1):
+                for flags in ({}, {"bad_mouthing": True}, {"ballot_stuffing": True}):
+                    witnesses.append(
+                        Witness(honesty=honesty, lying_mode=mode, bonus=0.3, **flags)
+                    )
+        ring = []
+        for agent in witnesses[::4] + providers[:3]:
+            agent.add_to_ring(ring)
+        for w in witnesses:
+            w.register_providers(providers)
+        witnesses.append(RandomWitness(partially_random=True))
+        witnesses[-1].register_providers(providers)
+
+        pool = WitnessPool(witnesses, providers)
+        testimonies = pool.testimonies()
+        for i, w in enumerate(witnesses[:-1]):
+            self.assertEqual(
+                testimonies[i].tolist(), [w.score_of(p) for p in providers]
+            )
+
+        providers[0].remove_from_ring()
+        witnesses[0].honesty = 1
+        pool.sync()
+        testimonies = pool.testimonies()
+        for i, w in enumerate(witnesses[:-1]):
+            self.assertEqual(
+                testimonies[i].tolist(), [w.score_of(p) for p in providers]
+            )
+
+    def test_sync_follows_set_attributes(self):
+        seed(42)
+        providers = [Provider() for _ in range(5)]
+        witnesses = [Witness(honesty=0, bonus=0.2, ballot_stuffing=True) for _ in range(4)]
+        for w in witnesses:
+            w.register_providers(providers)
+        pool = WitnessPool(witnesses, providers)
+        lies = pool._lies
+        pool.sync()
+        self.assertIs(pool._lies, lies)
+
+        witnesses[0].bonus = 0.6
+        witnesses[1].lying_mode = LyingMode.Inverse
+        witnesses[2].scores = {p: 0.5 for p in providers}
+        witnesses[3].bad_mouthing = True
+        providers[1].add_to_ring(witnesses[1].ring)
+        pool.sync()
+        testimonies = pool.testimonies()
+        for i, w in enumerate(witnesses):
+            self.assertEqual(testimonies[i].tolist(), [w.score_of(p) for p in providers])
+        self.assertTrue(pool.in_ring[1, 1])
+
+
+class TestingAgentRegistry(unittest.TestCase):
+    def test_dense_ids(self):
+        seed(42)
+        scenario = HostileEnvironment(
+            witness_amount=3, consumer_amount=2, provider_amount=4
+        )
+        sim = Simulation(scenario, Act, 2)
+        sim.run()
+        registry = sim.registry
+        self.assertEqual(len(registry.providers), 4)
+        for kind, agents in (
+            (registry.providers, sim.providers),
+            (registry.witnesses, sim.witnesses),
+            (registry.consumers, sim.consumers),
+        ):
+            self.assertEqual([kind.id_of(a) for a in agents], list(range(len(agents))))
+            self.assertEqual([kind[i] for i in range(len(agents))], agents)
+        self.assertEqual(registry.providers.ids_of(sim.providers[::-1]).tolist(), [3, 2, 1, 0])
+        for c in sim.consumers:
+            self.assertIs(c.registry, registry)
+
+
+class TestingParallelRuns(unittest.TestCase):
+    def test_reproducible_seeds(self):
+        seed(42)
+        scenario = HostileEnvironment(
+            witness_amount=3,
+            consumer_amount=2,
+            provider_amount=4,
+        )
+        sim = Simulation(scenario, Act, 30)
+
+        def totals(runs):
+            return [[sum(v) for v in con.values()] for con, _pro in runs]
+
+        first = totals(sim.parallel_runs(3, max_workers=2, seed=7))
+        second = totals(sim.parallel_runs(3, max_workers=3, seed=7))
+        unordered = totals(sim.parallel_runs(3, max_workers=2, seed=7, ordered=False))
+        self.assertEqual(first, second)
+        self.assertEqual(sorted(first), sorted(unordered))
+        self.assertEqual(len(sim.runs_data), 9)
+
+    def test_worker_profiles_merged(self):
+        if not profiler.enabled:
+            self.skipTest("profiling is disabled")
+        seed(42)
+        scenario = HostileEnvironment(witness_amount=3, consumer_amount=2, provider_amount=4)
+        sim = Simulation(scenario, Act, 30)
+        profiler.start("Simulation: epoch")
+        profiler.stop("Simulation: epoch")
+        epochs = profiler.timers["Simulation: epoch"].hits
+        list(sim.parallel_runs(4, max_workers=2, seed=7))
+        self.assertEqual(profiler.timers["Simulation: epoch"].hits, epochs + 4 * 30)
+        tasks = sum(w["Worker: task"].hits for w in profiler.workers.values())
+        self.assertGreaterEqual(tasks, 4)
+
+
+class TestingSweep(unittest.TestCase):
+    def setUp(self) -> None:
+        seed(42)
+        self.scenarios = {
+            "hostile": HostileEnvironment(
+                witness_amount=3, consumer_amount=2, provider_amount=4
+            ),
+        }
+        return super().setUp()
+
+    def test_longest_job_first(self):
+        sweep = Sweep(
+            [Act, ITEA, Travos],
+            self.scenarios,
+            {"": {}, "single": {"consumer_amount": 1}},
+            timings_file=None,
+        )
+        sweep.timings = {"ACT-RL_hostile": 1.0, "Travos_hostile": 50.0, "ITEA_hostile": 2.0}
+        names = [job.cell.name for job in sweep.schedule()]
+        self.assertEqual(
+            names,
+            [
+                "Travos_hostile",
+                "Travos-single_hostile",
+                "ITEA_hostile",
+                "ITEA-single_hostile",
+                "ACT-RL_hostile",
+                "ACT-RL-single_hostile",
+            ],
+        )
+
+    def test_run_chunks(self):
+        sweep = Sweep(
+            [Act, Travos],
+            self.scenarios,
+            runs=5,
+            chunk_size=2,
+            timings_file=None,
+        )
+        sweep.timings = {"ACT-RL_hostile": 10.0, "Travos_hostile": 6.0}
+        jobs = [(job.cell.name, job.runs) for job in sweep.schedule()]
+        self.assertEqual(
+            jobs,
+            [
+                ("ACT-RL_hostile", range(0, 2)),
+                ("ACT-RL_hostile", range(2, 4)),
+                ("Travos_hostile", range(0, 2)),
+                ("Travos_hostile", range(2, 4)),
+                ("ACT-RL_hostile", range(4, 5)),
+                ("Travos_hostile", range(4, 5)),
+            ],
+        )
+
+        def utilities(chunk_size, workers):
+            sweep = Sweep(
+                [Act],
+                self.scenarios,
+                epochs=10,
+                runs=5,
+                workers=workers,
+                chunk_size=chunk_size,
+                seed=7,
+                export_format=None,
+                timings_file=None,
+            )
+            [(_cell, results)] = list(sweep.run())
+            return [r.consumer_utility.tolist() for r in results]
+
+        self.assertEqual(utilities(2, 2), utilities(5, 1))
+
+    def test_result_set_per_cell(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sweep = Sweep(
+                [Act],
+                self.scenarios,
+                {"": {}, "single": {"consumer_amount": 1}},
+                epochs=10,
+                runs=2,
+                workers=1,
+                output_directory=directory,
+                timings_file=os.path.join(directory, "timings.json"),
+            )
+            shapes = {
+                cell.name: [r.consumer_utility.shape for r in results]
+                for cell, results in sweep.run()
+            }
+            self.assertEqual(
+                shapes,
+                {"ACT-RL_hostile": [(2, 10)] * 2, "ACT-RL-single_hostile": [(1, 10)] * 2},
+            )
+            self.assertEqual(len(os.listdir(directory)), 7)
+
+    def test_runs_match_parallel_runs(self):
+        sweep = Sweep(
+            [Act],
+            self.scenarios,
+            epochs=15,
+            runs=3,
+            workers=1,
+            seed=7,
+            export_format=None,
+            timings_file=None,
+        )
+        [(_cell, results)] = list(sweep.run())
+        sim = Simulation(self.scenarios["hostile"], Act, 15)
+        for result, (scores, true_values) in zip(results, sim.parallel_runs(3, seed=7)):
+            self.assertEqual(result.consumer_utility.tolist(), list(scores.values()))
+            self.assertEqual(result.provider_utility.tolist(), list(true_values.values()))
+
+
+class TestingResultSink(unittest.TestCase):
+    def test_chunks_match_single_frame(self):
+        blocks = [np.arange(21, dtype=float).reshape(3, 7) + i for i in range(4)]
+        expected = pd.concat(
+            [result_frame(b, i, "consumer_index", "utility") for i, b in enumerate(blocks)],
+            ignore_index=True,
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.csv")
+            # chunks smaller than a block, so blocks are split over several flushes
+            with ResultSink(path, "consumer_index", "utility", chunk_rows=5) as sink:
+                for i, block in enumerate(blocks):
+                    sink.append(block, i)
+            pd.testing.assert_frame_equal(pd.read_csv(path, index_col=0), expected)
+
+
+class TestingResultStore(unittest.TestCase):
+    def test_sweep_writes_store(self):
+        seed(42)
+        scenarios = {"hostile": HostileEnvironment(witness_amount=3, consumer_amount=2, provider_amount=4)}
+        with tempfile.TemporaryDirectory() as directory:
+            store_directory = os.path.join(directory, "store")
+            sweep = Sweep(
+                [Act],
+                scenarios,
+                epochs=10,
+                runs=3,
+                workers=1,
+                export_format=None,
+                store_directory=store_directory,
+                timings_file=None,
+            )
+            results = [r for _, results in sweep.run() for r in results]
+
+            store = ResultStore(store_directory)
+            self.assertEqual(store.methods("hostile"), ["ACT-RL"])
+            utility = store.load("ACT-RL", "hostile", "consumer_utility")
+            self.assertEqual(utility.shape, (3, 2, 10))
+            np.testing.assert_allclose(
+                store.epoch_mean("ACT-RL", "hostile", "consumer_utility"),
+                np.mean([r.consumer_utility for r in results], axis=(0, 1)),
+            )
+            self.assertEqual(os.listdir(directory), ["store"])
+
+    def test_ragged_csv_import(self):
+        frame = pd.DataFrame(
+            [
+                {
+                    "overall_run_index": run,
+                    "simulation_run_index": epoch,
+                    "consumer_index": consumer,
+                    "utility": run + consumer + epoch / 10,
+                }
+                for run, epochs in enumerate([6, 3, 5])
+                for consumer in range(2)
+                for epoch in range(epochs)
+            ]
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ragged_consumer_utility.csv")
+            frame.to_csv(path)
+            store = ResultStore(os.path.join(directory, "store"))
+            store.import_csv(path, "ACT-RL", "ragged", "consumer_utility")
+            self.assertEqual(store.load("ACT-RL", "ragged", "consumer_utility").shape, (3, 2, 6))
+            np.testing.assert_allclose(
+                store.epoch_mean("ACT-RL", "ragged", "consumer_utility"),
+                frame.groupby("simulation_run_index")["utility"].mean().to_numpy(),
+            )
+
+
+class TestingResultSummary(unittest.TestCase):
+    def test_running_statistics(self):
+        samples = np.random.default_rng(0).normal(size=(40, 6))
+        statistics = RunningStatistics(6, reservoir_size=40)
+        for sample in samples:
+            statistics.add(sample)
+        np.testing.assert_allclose(statistics.mean, samples.mean(axis=0))
+        np.testing.assert_allclose(statistics.variance, samples.var(axis=0, ddof=1))
+        np.testing.assert_allclose(
+            statistics.quantiles([0.5]), np.quantile(samples, [0.5], axis=0)
+        )
+
+    def test_no_reservoir_leaves_random_untouched(self):
+        seed(42)
+        expected = random()
+        seed(42)
+        summary = ResultSummary(6)
+        for sample in np.random.default_rng(0).normal(size=(5, 3, 6)):
+            summary.add(RunResult(sample, sample, sample))
+        self.assertEqual(random(), expected)
+
+    def test_merge(self):
+        samples = np.random.default_rng(0).normal(size=(23, 6))
+        for size in (0, 5, 40):
+            statistics = RunningStatistics(6, reservoir_size=size, seed=1)
+            other = RunningStatistics(6, reservoir_size=size, seed=2)
+            for sample in samples[:9]:
+                statistics.add(sample)
+            for sample in samples[9:]:
+                other.add(sample)
+            statistics.merge(other)
+            self.assertEqual(statistics.count, 23)
+            np.testing.assert_allclose(statistics.mean, samples.mean(axis=0))
+            np.testing.assert_allclose(statistics.variance, samples.var(axis=0, ddof=1))
+            for row in statistics.reservoir[: min(size, 23)]:
+                self.assertTrue((samples == row).all(axis=1).any())
+        np.testing.assert_array_equal(
+            np.sort(statistics.reservoir[:23], axis=0), np.sort(samples, axis=0)
+        )
+
+    def test_summary_only_sweep(self):
+        seed(42)
+        scenarios = {"hostile": HostileEnvironment(witness_amount=3, consumer_amount=2, provider_amount=4)}
+        with tempfile.TemporaryDirectory() as directory:
+            sweep = Sweep(
+                [Act],
+                scenarios,
+                epochs=10,
+                runs=4,
+                workers=1,
+                output_directory=directory,
+                summary_only=True,
+                timings_file=None,
+            )
+            [(_, summary)] = list(sweep.run())
+            self.assertEqual(summary.statistics["consumer_utility"].count, 4)
+            self.assertEqual(os.listdir(directory), ["ACT-RL_hostile_summary.csv"])
+            frame = pd.read_csv(os.path.join(directory, "ACT-RL_hostile_summary.csv"))
+            self.assertEqual(len(frame), 3 * 10)
+
+
+class TestingProfiler(unittest.TestCase):
+    def test_running_aggregates(self):
+        profiler = Profiler(reservoir_size=3, enabled=True)
+
+        @profiler.profile
+        def work(n):
+            return work(n - 1) if n else 0
+
+        for _ in range(10):
+            work(2)
+        timer = profiler.timers[f"Function:{work.__qualname__}"]
+        self.assertEqual(timer.hits, 30)
+        self.assertEqual(len(timer.reservoir), 3)
+        self.assertLessEqual(timer.min, timer.max)
+        self.assertLessEqual(timer.max, timer.total)
+
+        profiler.start("outer")
+        profiler.start("outer")
+        profiler.stop("outer")
+        profiler.stop("outer")
+        self.assertEqual(profiler.timers["outer"].hits, 2)
+        self.assertFalse(profiler.timers["outer"].running)
+
+    def test_overrides_timed_apart(self):
+        profiler = Profiler(enabled=True)
+
+        class Base:
+            @profiler.profile
+            def step(self):
+                return 1
+
+        class Derived(Base):
+            @profiler.profile
+            def step(self):
+                return super().step() + 1
+
+        for _ in range(3):
+            Derived().step()
+        Base().step()
+        self.assertEqual(profiler.timers[f"Function:{Base.step.__qualname__}"].hits, 4)
+        self.assertEqual(profiler.timers[f"Function:{Derived.step.__qualname__}"].hits, 3)
+
+    def test_call_tree(self):
+        profiler = Profiler(enabled=True, tracing=True)
+
+        @profiler.profile
+        def inner():
+            return 1
+
+        @profiler.profile
+        def outer():
+            return inner() + inner()
+
+        profiler.start("epoch")
+        outer()
+        profiler.stop("epoch")
+        epoch = profiler.root.children["epoch"]
+        node = epoch.children[outer.__qualname__].children[inner.__qualname__]
+        self.assertEqual(node.hits, 2)
+        self.assertLessEqual(node.total, epoch.total)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.json")
+            profiler.write_speedscope(path)
+            with open(path) as f:
+                events = json.load(f)["profiles"][0]["events"]
+            self.assertEqual([e["type"] for e in events], ["O", "O", "O", "C", "C", "C"])
+
+    def test_disabled_returns_function(self):
+        profiler = Profiler(enabled=False)
+
+        def work():
+            return 1
+
+        self.assertIs(profiler.profile(work), work)
+        profiler.start()
+        profiler.stop()
+        self.assertEqual(profiler.timers, {})
+
+
+class TestingBenchmark(unittest.TestCase):
+    def test_run_and_compare(self):
+        report = benchmark.run_benchmarks(
+            ["ACT-RL"], ["hostile"], ["epochs"], repeat=1, memory=False
+        )
+        self.assertEqual(len(report["results"]), len(benchmark.SCALING["epochs"]))
+        for result in report["results"].values():
+            self.assertGreater(result["epochs_per_second"], 0)
+
+        slower = {
+            "results": {
+                key: {**r, "wall_time": r["wall_time"] * 2}
+                for key, r in report["results"].items()
+            }
+        }
+        self.assertEqual(benchmark.compare(report, report), [])
+        self.assertEqual(len(benchmark.compare(report, slower, 0.5)), len(report["results"]))
+
+
+class TestingEquivalence(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scenario = Simple(
+            witnesses=[Witness(honesty=0.5, bonus=0.3, bad_mouthing=True) for _ in range(4)]
+            + [Witness(honesty=0.3, bonus=0.3, ballot_stuffing=True) for _ in range(3)],
+            consumer_amount=2,
+            provider_amount=5,
+        )
+        return super().setUp()
+
+    def test_array_engine_matches_reference(self):
+        for ntcm in [Act, Travos]:
+            for options in [{}, {"testimony_mode": to_trust.TestimonyMode.PerEpoch}]:
+                equivalence = compare_engines(
+                    self.scenario, ntcm, epochs=40, runs=3, candidate_options=options, seed=3
+                )
+                assert_equivalent(equivalence)
+                assert_statistically_equivalent(equivalence)
+
+    def test_array_act_matches_act(self):
+        for options in [{}, {"testimony_mode": to_trust.TestimonyMode.PerEpoch}]:
+            equivalence = compare_engines(
+                self.scenario,
+                Act,
+                ArrayAct,
+                epochs=40,
+                runs=3,
+                candidate=Simulation,
+                candidate_options=options,
+                seed=3,
+            )
+            assert_equivalent(equivalence)
+
+
 class TestBase(unittest.TestCase):
     def setUp(self) -> None:
         seed(42)
@@ -1,4 +1,4 @@
-from .agents import Agent, Consumer, LyingMode, Provider, Witness
+from .agents import Agent, Consumer, LyingMode, Provider, TestimonyMode, Witness
 from .metrics import MetricSystem, normalized_average_utility_leftover
-from .testbed import Scenario, Simulation
+from .testbed import ArraySimulation, Scenario, Simulation
 from .util import ToDoException
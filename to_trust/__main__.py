@@ -1,210 +1,115 @@
 import matplotlib.pyplot as plt
-import pandas as pd
+import numpy as np
 from to_trust.util import profiler
 
-from to_trust.methods import ITEA, MET, Act, Travos
 from to_trust.metrics import MetricSystem
+from to_trust.results import RunResult
 from to_trust.settings import (
+    chunk_size,
+    common_random_numbers,
     epochs,
+    export_format,
     line_alpha,
-    ntcm_type,
+    method_overrides,
+    methods,
+    overrides,
     plot_average,
     plot_run,
+    profile_trace,
+    reservoir_size,
+    result_store,
     runs,
     scenarios,
+    summary_only,
+    testimony_mode,
+    workers,
 )
-from to_trust.testbed.simulation import Simulation
-
-
-def name_of(ntcm):
-    if ntcm is Travos:
-        return "Travos"
-    elif ntcm is Act:
-        return "ACT-RL"
-    elif ntcm is ITEA:
-        return "ITEA"
-    elif ntcm is MET:
-        return "MET"
-    else:
-        raise Exception("Method doesn't exist")
+from to_trust.sweep import Cell, Sweep
+
+
+def plot_result(cell: Cell, result: RunResult):
+    # compounded utility per agent, without the last epoch
+    consumer_list = np.cumsum(result.consumer_utility, axis=1) - result.consumer_utility
+    provider_list = np.cumsum(result.provider_utility, axis=1) - result.provider_utility
+    best_consumer = consumer_list[:, -1].argmax()
+    best_provider = provider_list[:, -1].argmax()
+
+    if plot_average:
+        plt.plot(consumer_list.mean(axis=0), "-", lw=4, label="Average Consumer")
+        plt.plot(provider_list.mean(axis=0), ":", lw=4, label="Average Provider")
+
+    consumer_label_set = False
+    for consumer, values in enumerate(consumer_list):
+        if best_consumer == consumer:
+            plt.plot(values, "-b", label="Best Consumer")
+        elif not consumer_label_set:
+            plt.plot(values, "-g", label="Consumer", alpha=line_alpha)
+            consumer_label_set = True
+        else:
+            plt.plot(values, "-g", alpha=line_alpha)
+
+    provider_label_set = False
+    for provider, values in enumerate(provider_list):
+        if best_provider == provider:
+            plt.plot(values, ":c", label="Best Provider")
+        elif not provider_label_set:
+            plt.plot(values, ":r", label="Provider", alpha=line_alpha)
+            provider_label_set = True
+        else:
+            plt.plot(values, ":r", alpha=line_alpha)
+
+    plt.title(f"Trust Simulation - {cell.scenario_name} - {cell.method_name}")
+    plt.xlabel("Time step")
+    plt.ylabel("Accumulated Utility")
+    plt.legend()
+    plt.show()
+
+    for mae in result.consumer_mae:
+        plt.plot(mae)
+    plt.show()
 
 
 if __name__ == "__main__":
     sensor = MetricSystem()
+    profiler.tracing = profile_trace is not None
     profiler.start()
-    print(f"Running {name_of(ntcm_type)}")
-
-    consumer_utility_data = pd.DataFrame(
-        [],
-        columns=[
-            "overall_run_index",
-            "simulation_run_index",
-            "consumer_index",
-            "utility",
-        ],
-    )
-    provider_utility_data = pd.DataFrame(
-        [],
-        columns=[
-            "overall_run_index",
-            "simulation_run_index",
-            "provider_index",
-            "utility",
-        ],
-    )
 
-    consumer_mae_data = pd.DataFrame(
-        [],
-        columns=["overall_run_index", "simulation_run_index", "consumer_index", "mae"],
+    sweep = Sweep(
+        methods,
+        scenarios,
+        overrides,
+        method_overrides=method_overrides,
+        epochs=epochs,
+        runs=runs,
+        workers=workers,
+        chunk_size=chunk_size,
+        simulation_options={"testimony_mode": testimony_mode},
+        common_random_numbers=common_random_numbers,
+        export_format=export_format,
+        store_directory=result_store,
+        summary_only=summary_only,
+        reservoir_size=reservoir_size,
     )
-    for s in scenarios:
-        simulation = Simulation(scenarios[s], ntcm_type, runs)
-
-        for overall_run_index, (consumers, providers) in enumerate(
-            simulation.runs(epochs, printing=True)
-        ):
-            sensor.measure(consumers, providers, runs)
-            profiler.start("single run")
-
-            # collect data for export
-            consumer_utility_data_one_run = (
-                pd.DataFrame(consumers.values())
-                .stack()
-                .reset_index()
-                .rename(
-                    columns={
-                        "level_0": "consumer_index",
-                        "level_1": "simulation_run_index",
-                        0: "utility",
-                    }
-                )
-            )
-            consumer_utility_data_one_run["overall_run_index"] = overall_run_index
-            consumer_utility_data = pd.concat(
-                [consumer_utility_data, consumer_utility_data_one_run],
-                ignore_index=True,
-            )
-
-            provider_utility_data_one_run = (
-                pd.DataFrame(providers.values())
-                .stack()
-                .reset_index()
-                .rename(
-                    columns={
-                        "level_0": "provider_index",
-                        "level_1": "simulation_run_index",
-                        0: "utility",
-                    }
-                )
-            )
-            provider_utility_data_one_run["overall_run_index"] = overall_run_index
-            provider_utility_data = pd.concat(
-                [provider_utility_data, provider_utility_data_one_run],
-                ignore_index=True,
-            )
-
-            print()
+    print(f"Running {', '.join(cell.name for cell in sweep.cells())}")
+
+    for cell, results in sweep.run(printing=True):
+        if summary_only:
+            statistics = results.statistics
+            print(f"Consumer Average: {statistics['consumer_utility'].mean.sum():.2f}")
+            print(f"Provider Average: {statistics['provider_utility'].mean.sum():.2f}")
+            continue
+        for result in results:
+            consumers = dict(enumerate(result.consumer_utility))
+            providers = dict(enumerate(result.provider_utility))
+            sensor.measure(consumers, providers, epochs)
             print(f"Consumer Average: {sensor.average(consumers):.2f}")
             print(f"Provider Average: {sensor.average(providers):.2f}")
-
-            consumer_list = {
-                _c: [sum(_v[:v]) for v in range(len(_v))]
-                for _c, _v in consumers.items()
-            }  # get the compounded list per consumer which contains the values
-            best_consumer = max(
-                consumer_list.keys(), key=lambda c: consumer_list[c][-1]
-            )
-
-            provider_list = {
-                _p: [sum(_v[:v]) for v in range(len(_v))]
-                for _p, _v in providers.items()
-            }  # Same but then for the providers
-            best_provider = max(
-                provider_list.keys(), key=lambda p: provider_list[p][-1]
-            )
-
-            consumer_label_set = False
-            provider_label_set = False
-
-            average_provider = [
-                sum(x) / len(provider_list.values())
-                for x in zip(*provider_list.values())
-            ]
-            average_consumer = [
-                sum(x) / len(consumer_list.values())
-                for x in zip(*consumer_list.values())
-            ]
-
-            if plot_average:
-                plt.plot(average_consumer, "-", lw=4, label="Average Consumer")
-                plt.plot(average_provider, ":", lw=4, label="Average Provider")
-
-            for consumer in consumers:
-                if best_consumer == consumer:
-                    plt.plot(consumer_list[consumer], "-b", label="Best Consumer")
-                else:
-                    if not consumer_label_set:
-                        plt.plot(
-                            consumer_list[consumer],
-                            "-g",
-                            label="Consumer",
-                            alpha=line_alpha,
-                        )
-                        consumer_label_set = True
-                    else:
-                        plt.plot(consumer_list[consumer], "-g", alpha=line_alpha)
-
-            for provider in providers:
-                if best_provider == provider:
-                    plt.plot(provider_list[provider], ":c", label="Best Provider")
-                else:
-                    if not provider_label_set:
-                        plt.plot(
-                            provider_list[provider],
-                            ":r",
-                            label="Provider",
-                            alpha=line_alpha,
-                        )
-                        provider_label_set = True
-                    else:
-                        plt.plot(provider_list[provider], ":r", alpha=line_alpha)
-
-            profiler.stop("single run")
-            plt.title(f"Trust Simulation - {s} - {name_of(ntcm_type)}")
-            plt.xlabel("Time step")
-            plt.ylabel("Accumulated Utility")
-            plt.legend()
             if plot_run:
-                plt.show()
-
-            consumer_mae_data_one_run = []
-            for c in consumers:
-                plt.plot(c.MAE)
-                consumer_mae_data_one_run.append(c.MAE)
-            if plot_run:
-                plt.show()
-
-            # collect data for export
-            consumer_mae_data_one_run = (
-                pd.DataFrame(consumer_mae_data_one_run)
-                .stack()
-                .reset_index()
-                .rename(
-                    columns={
-                        "level_0": "consumer_index",
-                        "level_1": "simulation_run_index",
-                        0: "mae",
-                    }
-                )
-            )
-            consumer_mae_data_one_run["overall_run_index"] = overall_run_index
-            consumer_mae_data = pd.concat(
-                [consumer_mae_data, consumer_mae_data_one_run], ignore_index=True
-            )
-        name = name_of(ntcm_type)
-        consumer_utility_data.to_csv(name + "_" + s + "_consumer_utility_data.csv")
-        provider_utility_data.to_csv(name + "_" + s + "_provider_utility_data.csv")
-        consumer_mae_data.to_csv(name + "_" + s + "_consumer_mae_data.csv")
+                plot_result(cell, result)
 
     profiler.stop()
     profiler.show()
+    if profile_trace == "chrome":
+        profiler.write_chrome_trace("profile_trace.json")
+    elif profile_trace == "speedscope":
+        profiler.write_speedscope("profile.speedscope.json")
@@ -2,6 +2,9 @@ from .agent import Agent, LyingMode
 from .consumer import Consumer
 from .provider import Provider
 from .witness import Witness
+from .witness_pool import WitnessPool
 from .consumer import Consumer
 from .random_witness import RandomWitness
+from .registry import AgentIndex, AgentRegistry
+from .testimony import TestimonyCache, TestimonyMode
 
@@ -6,6 +6,9 @@ from to_trust.util import ToDoException, profiler
 
 
 class Agent(ABC):
+    ring_changes = 0
+    """number of times any agent joined or left a ring, `WitnessPool`s resync their rings when it changed"""
+
     def __init__(self) -> None:
         super().__init__()
         self.ring = []
@@ -14,11 +17,13 @@ class Agent(ABC):
     def add_to_ring(self, ring):
         self.ring = ring
         self.ring.append(self)
+        Agent.ring_changes += 1
 
     @profiler.profile
     def remove_from_ring(self):
         self.ring.remove(self)
         self.ring = []
+        Agent.ring_changes += 1
 
     @profiler.profile
     def update(self, *_: Any) -> None:
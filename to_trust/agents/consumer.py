@@ -1,13 +1,25 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
 from to_trust.util import ToDoException, profiler
 
 from .provider import Provider
+from .testimony import TestimonyCache
 from .witness import Witness
+from .witness_pool import WitnessPool, uniform_draws
+
+if TYPE_CHECKING:
+    from .registry import AgentRegistry
 
 
 class Consumer(Witness):
     witnesses: dict[Witness, float | None]
     scores: dict[Provider, float]
     providers: dict[Provider, float | None]
+    testimonies: TestimonyCache | None
+    registry: "AgentRegistry | None"
+    _witness_pool: WitnessPool | None
 
     @staticmethod
     def preprocess(witnesses, providers):
@@ -22,21 +34,59 @@ class Consumer(Witness):
         self.providers = {}
         self.scores = {}
         self.MAE = []
+        self.testimonies = None
+        self.registry = None
+        self._witness_pool = None
 
     @profiler.profile
     def register_witnesses(self, witnesses: list[Witness]):
         for w in witnesses:
             self.witnesses[w] = None
+        self._witness_pool = None
 
     @profiler.profile
     def register_providers(self, providers: list[Provider]):
         for p in providers:
             self.providers[p] = None
+        self._witness_pool = None
 
     @profiler.profile
     def update_provider(self, p: Provider, score: float) -> None:
         raise ToDoException()
 
+    def testimony_of(self, witness: Witness, provider: Provider) -> float:
+        """The testimony of `witness` about `provider`, served from the epoch cache when the simulation shares one"""
+        if self.testimonies is None:
+            return witness.score_of(provider)
+        return self.testimonies.score_of(witness, provider)
+
+    @profiler.profile
+    def ask_witnesses(self, witnesses: list[Witness], providers: list[Provider]) -> np.ndarray:
+        """
+        The (witnesses x providers) testimonies, asked provider by provider and witness by
+        witness: the same testimonies and random draws as `testimony_of` calls in that order.
+        Without a shared cache the witnesses that testify through their base scores are asked
+        at once, with one uniform honesty draw each like `Witness.score_of`.
+        """
+        if self.testimonies is None and witnesses and providers:
+            pool = self._pool()
+            rows = np.fromiter(map(pool.witness_index.__getitem__, witnesses), dtype=np.intp)
+            if not pool.own_testimony[rows].any():
+                columns = np.fromiter(map(pool.provider_index.__getitem__, providers), dtype=np.intp)
+                draws = uniform_draws(len(rows) * len(columns))
+                return pool.testimonies_of(rows, columns, draws.reshape(len(columns), len(rows)).T)
+        testimonies = [[self.testimony_of(w, p) for w in witnesses] for p in providers]
+        return np.array(testimonies, dtype=float).reshape(len(providers), len(witnesses)).T
+
+    def _pool(self) -> WitnessPool:
+        """The registered witnesses as a `WitnessPool`, with their current honesty and rings"""
+        # built on first use, after the methods had the chance to preprocess the witnesses
+        if self._witness_pool is None:
+            self._witness_pool = WitnessPool(list(self.witnesses), list(self.providers))
+        else:
+            self._witness_pool.sync()
+        return self._witness_pool
+
     @profiler.profile
     def choose_provider(self) -> Provider:
         if len(self.providers) == 0:
@@ -46,7 +96,7 @@ class Consumer(Witness):
         for provider in self.providers:
             testimonies: dict[Witness, float] = {}
             for witness in self.witnesses:
-                testimonies[witness] = witness.score_of(provider)
+                testimonies[witness] = self.testimony_of(witness, provider)
 
         return best_provider
 
@@ -29,8 +29,9 @@ class Provider(Agent):
         self.cost = cost if cost is not None else l_cost + (u_cost - l_cost) * random()
 
     @profiler.profile
-    def get_service(self) -> float:
-        if self.chance > random():
+    def get_service(self, draw: float | None = None) -> float:
+        """The utility of one interaction, `draw` replaces the random draw when given"""
+        if self.chance > (random() if draw is None else draw):
             return self.quality - self.cost
         return -self.cost
 
@@ -0,0 +1,58 @@
+from typing import Generic, Iterator, TypeVar
+
+import numpy as np
+
+from .agent import Agent
+from .consumer import Consumer
+from .provider import Provider
+from .witness import Witness
+
+A = TypeVar("A", bound=Agent)
+
+
+class AgentIndex(Generic[A]):
+    """Dense integer ids `0..n-1` for one kind of agent, in registration order"""
+
+    def __init__(self, agents: list[A]) -> None:
+        self.agents = list(agents)
+        self.ids = {a: i for i, a in enumerate(self.agents)}
+
+    def __len__(self) -> int:
+        return len(self.agents)
+
+    def __iter__(self) -> Iterator[A]:
+        return iter(self.agents)
+
+    def __contains__(self, agent: object) -> bool:
+        return agent in self.ids
+
+    def __getitem__(self, i: int) -> A:
+        return self.agents[i]
+
+    def id_of(self, agent: A) -> int:
+        return self.ids[agent]
+
+    def ids_of(self, agents: list[A]) -> np.ndarray:
+        return np.fromiter((self.ids[a] for a in agents), dtype=np.intp, count=len(agents))
+
+
+class AgentRegistry:
+    """
+    The id <-> agent mapping of one simulation run, so methods can keep their state in
+    arrays indexed by provider, witness or consumer id instead of dicts keyed by agent.
+    Every kind has its own id space, a consumer acting as witness has an id in both.
+    """
+
+    providers: AgentIndex[Provider]
+    witnesses: AgentIndex[Witness]
+    consumers: AgentIndex[Consumer]
+
+    def __init__(
+        self,
+        providers: list[Provider],
+        witnesses: list[Witness],
+        consumers: list[Consumer],
+    ) -> None:
+        self.providers = AgentIndex(providers)
+        self.witnesses = AgentIndex(witnesses)
+        self.consumers = AgentIndex(consumers)
@@ -0,0 +1,90 @@
+from enum import Enum
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from to_trust.util import profiler
+
+from .provider import Provider
+from .witness import Witness
+from .witness_pool import WitnessPool, has_own_testimony
+
+if TYPE_CHECKING:
+    from .registry import AgentRegistry
+
+
+class TestimonyMode(Enum):
+    PerCall = 1
+    """every `score_of` call of every consumer draws the honesty of the witness again"""
+    PerEpoch = 2
+    """one honesty draw per (witness, provider, epoch), shared by all consumers"""
+
+
+class TestimonyCache:
+    """
+    The (witnesses x providers) testimony matrix of the current epoch, computed by a
+    `WitnessPool`, or with `vectorized=False` by a `Witness.score_of` call per entry
+    """
+
+    matrix: np.ndarray
+    pool: WitnessPool | None
+    version: int
+    """number of refreshes so far"""
+    changed: np.ndarray
+    """ids of the providers whose testimonies differ from the previous refresh"""
+
+    def __init__(self, registry: "AgentRegistry", vectorized: bool = True) -> None:
+        self.witnesses = registry.witnesses.agents
+        self.providers = registry.providers.agents
+        self.witness_ids = registry.witnesses.ids
+        self.provider_ids = registry.providers.ids
+        self.vectorized = vectorized
+        self._own_testimony = [has_own_testimony(w) for w in self.witnesses]
+        self.pool = None
+        self.matrix = np.zeros((len(self.witnesses), len(self.providers)))
+        self._rows: list[list[float]] = self.matrix.tolist()
+        self.version = 0
+        self.changed = np.arange(len(self.providers))
+
+    @profiler.profile
+    def refresh(self, draws: np.ndarray | None = None):
+        """
+        Collect the testimonies of the new epoch, `draws` replaces the uniform
+        (witnesses x providers) honesty draws when given
+        """
+        previous = self.matrix
+        self._collect(draws)
+        self.changed = (self.matrix != previous).any(axis=0).nonzero()[0]
+        self.version += 1
+
+    def _collect(self, draws: np.ndarray | None):
+        if not self.vectorized:
+            self._rows = [
+                [
+                    w.score_of(p)
+                    if draws is None or self._own_testimony[i]
+                    else w.score_of(p, draws[i, j])
+                    for j, p in enumerate(self.providers)
+                ]
+                for i, w in enumerate(self.witnesses)
+            ]
+            self.matrix = np.array(self._rows, dtype=float).reshape(len(self.witnesses), -1)
+            return
+        # built on the first epoch, after the methods had the chance to preprocess the witnesses
+        if self.pool is None:
+            self.pool = WitnessPool(self.witnesses, self.providers)
+        else:
+            self.pool.sync()
+        self.matrix = self.pool.testimonies(draws)
+        self._rows = self.matrix.tolist()
+
+    def changed_since(self, version: int | None) -> list[Provider] | None:
+        """The providers whose testimonies changed after `version`, None when that is unknown"""
+        if version == self.version:
+            return []
+        if version == self.version - 1:
+            return [self.providers[i] for i in self.changed]
+        return None
+
+    def score_of(self, witness: Witness, provider: Provider) -> float:
+        return self._rows[self.witness_ids[witness]][self.provider_ids[provider]]
@@ -1,3 +1,4 @@
+from operator import attrgetter
 from random import choice, random
 
 from to_trust.util import profiler
@@ -6,14 +7,29 @@ from .agent import Agent, LyingMode
 from .provider import Provider
 
 
+def _pooled(name: str) -> property:
+    """An attribute `WitnessPool`s keep a copy of, setting it tells them to pull it again"""
+    attribute = f"_{name}"
+
+    def set_value(self, value):
+        setattr(self, attribute, value)
+        Witness.changes += 1
+
+    return property(attrgetter(attribute), set_value)
+
+
 class Witness(Agent):
-    honesty: float
+    changes = 0
+    """number of times a pooled attribute of any witness was set, see `WitnessPool.sync`"""
+
+    honesty: float = _pooled("honesty")
     honesty_step: float
-    ballot_stuffing: bool
-    lying_mode: LyingMode
-    bad_mouthing: bool
-    scores: dict[Provider, float]
-    bonus: float
+    ballot_stuffing: bool = _pooled("ballot_stuffing")
+    lying_mode: LyingMode = _pooled("lying_mode")
+    bad_mouthing: bool = _pooled("bad_mouthing")
+    scores: dict[Provider, float] = _pooled("scores")
+    """replaced as a whole, a `WitnessPool` doesn't see a base score changed in place"""
+    bonus: float = _pooled("bonus")
 
     def __init__(
         self,
@@ -40,12 +56,13 @@ class Witness(Agent):
         self.epochs_before_change = epochs_before_dishonest
 
     @profiler.profile
-    def score_of(self, provider: Provider) -> float:
+    def score_of(self, provider: Provider, draw: float | None = None) -> float:
+        """The testimony about `provider`, `draw` replaces the uniform honesty draw when given"""
         if provider not in self.scores:
             self.scores[provider] = 0
         ret_val: float = self.scores[provider]
 
-        if not self.honest():
+        if not self.honest(draw):
             match (provider in self.ring, self.lying_mode):
                 case (True, LyingMode.Fixed):
                     ret_val = self.bonus
@@ -65,8 +82,8 @@ class Witness(Agent):
 
         return min(1.0, max(0.0, ret_val))
 
-    def honest(self):
-        return self.honesty >= random()
+    def honest(self, draw: float | None = None):
+        return self.honesty >= (random() if draw is None else draw)
 
     @profiler.profile
     def becomes_dishonest(self):
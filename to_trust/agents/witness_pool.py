@@ -0,0 +1,169 @@
+from random import getrandbits
+
+import numpy as np
+
+from to_trust.util import profiler
+
+from .agent import Agent, LyingMode
+from .provider import Provider
+from .witness import Witness
+
+
+def uniform_draws(n: int) -> np.ndarray:
+    """
+    The next `n` values of `random.random()` at once, the `random` module ends up in the same
+    state as after `n` calls. CPython builds every double from two 32 bit Mersenne Twister
+    words, which `getrandbits` hands out in the same order, least significant first.
+    """
+    if n == 0:
+        return np.zeros(0)
+    words = np.frombuffer(getrandbits(64 * n).to_bytes(8 * n, "little"), dtype="<u4")
+    return ((words[0::2] >> 5) * 67108864.0 + (words[1::2] >> 6)) * (1.0 / 9007199254740992.0)
+
+
+def has_own_testimony(witness: Witness) -> bool:
+    """Whether `witness` testifies in its own way instead of through its base scores"""
+    return (
+        type(witness).score_of is not Witness.score_of
+        or type(witness).register_providers is not Witness.register_providers
+    )
+
+
+class WitnessPool:
+    """
+    Array form of a group of witnesses: the base scores as a (witnesses x providers) array,
+    honesty, bonus and the lying flags per witness and the ring membership of the providers
+    per witness, so the testimonies of every witness about every provider take a handful
+    of NumPy operations instead of a `Witness.score_of` call each.
+
+    The `Witness` objects stay the handles scenarios and consumers work with; `sync` pulls
+    the attributes that were set on them and the ring changes into the arrays. Witnesses
+    that testify in their own way (subclasses overriding `score_of`, consumers acting as
+    witness) keep using `score_of`.
+    """
+
+    scores: np.ndarray
+    honesty: np.ndarray
+    bonus: np.ndarray
+    ballot_stuffing: np.ndarray
+    bad_mouthing: np.ndarray
+    in_ring: np.ndarray
+    ring_empty: np.ndarray
+
+    def __init__(
+        self,
+        witnesses: list[Witness],
+        providers: list[Provider],
+        seed: int | None = None,
+    ) -> None:
+        self.witnesses = witnesses
+        self.providers = providers
+        self.provider_index = {p: i for i, p in enumerate(providers)}
+        self.witness_index = {w: i for i, w in enumerate(witnesses)}
+        self.seed = seed
+        self._rng = None
+        self._witness_changes = None
+        self._ring_changes = None
+        self.sync()
+
+    @property
+    def rng(self) -> np.random.Generator:
+        # created on the first draw, so pools only given draws leave `random` untouched
+        if self._rng is None:
+            # fall back on the `random` module so `random.seed` keeps runs reproducible
+            self._rng = np.random.default_rng(
+                self.seed if self.seed is not None else getrandbits(64)
+            )
+        return self._rng
+
+    @profiler.profile
+    def sync(self):
+        """
+        Pull the changes of the witnesses into the arrays. The witnesses are only gone over
+        when a pooled attribute of a witness was set (`Witness.changes`) or an agent joined or
+        left a ring (`Agent.ring_changes`) since the last sync.
+        """
+        witnesses_changed = self._witness_changes != Witness.changes
+        rings_changed = self._ring_changes != Agent.ring_changes
+        if witnesses_changed:
+            self._witness_changes = Witness.changes
+            self._pull_witnesses()
+        if rings_changed:
+            self._ring_changes = Agent.ring_changes
+            self._pull_rings()
+        if witnesses_changed or rings_changed:
+            self._lies = self._lying_scores()
+
+    def _pull_witnesses(self):
+        witnesses, providers = self.witnesses, self.providers
+        self.scores = np.array(
+            [[w.scores.get(p, 0) for p in providers] for w in witnesses], dtype=float
+        ).reshape(len(witnesses), len(providers))
+        self.honesty = np.array([w.honesty for w in witnesses], dtype=float)
+        self.bonus = np.array([w.bonus for w in witnesses], dtype=float)
+        self.ballot_stuffing = np.array([w.ballot_stuffing for w in witnesses], dtype=bool)
+        self.bad_mouthing = np.array([w.bad_mouthing for w in witnesses], dtype=bool)
+        self._modes = {
+            mode: np.array([w.lying_mode == mode for w in witnesses], dtype=bool)
+            for mode in LyingMode
+        }
+        self._custom = [i for i, w in enumerate(witnesses) if has_own_testimony(w)]
+        self.own_testimony = np.zeros(len(witnesses), dtype=bool)
+        self.own_testimony[self._custom] = True
+
+    def _pull_rings(self):
+        self.ring_empty = np.array([len(w.ring) == 0 for w in self.witnesses], dtype=bool)
+        self.in_ring = np.zeros((len(self.witnesses), len(self.providers)), dtype=bool)
+        for i, w in enumerate(self.witnesses):
+            for member in w.ring:
+                j = self.provider_index.get(member)
+                if j is not None:
+                    self.in_ring[i, j] = True
+
+    def _lying_scores(self) -> np.ndarray:
+        """What every witness reports about every provider when it is not honest"""
+        base = self.scores
+        ring = self.in_ring
+        bonus = self.bonus[:, None]
+
+        fixed = np.where(ring, bonus, 1 - bonus)
+        bonus_delta = np.where(
+            ring,
+            np.where(self.ballot_stuffing, self.bonus, 0)[:, None],
+            np.where(
+                self.bad_mouthing[:, None],
+                -bonus,
+                np.where((self.ballot_stuffing & self.ring_empty)[:, None], bonus, 0),
+            ),
+        )
+        inverse = np.where(ring, base, 1 - base)
+
+        lies = np.where(self._modes[LyingMode.Fixed][:, None], fixed, base)
+        lies = np.where(self._modes[LyingMode.Bonus][:, None], base + bonus_delta, lies)
+        return np.where(self._modes[LyingMode.Inverse][:, None], inverse, lies)
+
+    @profiler.profile
+    def testimonies(self, draws: np.ndarray | None = None) -> np.ndarray:
+        """
+        The (witnesses x providers) testimony matrix with one honesty draw per entry,
+        `draws` replaces the uniform draws when given
+        """
+        if draws is None:
+            draws = self.rng.random(self.scores.shape)
+        honest = self.honesty[:, None] >= draws
+        testimonies = np.clip(np.where(honest, self.scores, self._lies), 0.0, 1.0)
+        for i in self._custom:
+            w = self.witnesses[i]
+            testimonies[i] = [w.score_of(p) for p in self.providers]
+        return testimonies
+
+    def testimonies_of(
+        self, rows: np.ndarray, columns: np.ndarray, draws: np.ndarray
+    ) -> np.ndarray:
+        """
+        The testimonies of the witnesses at `rows` about the providers at `columns`, for
+        the given (rows x columns) honesty draws. Only for witnesses without `own_testimony`.
+        """
+        cells = (rows[:, None], columns)
+        honest = self.honesty[rows][:, None] >= draws
+        return np.clip(np.where(honest, self.scores[cells], self._lies[cells]), 0.0, 1.0)
@@ -0,0 +1,214 @@
+"""
+Scaling benchmarks of the trust methods, stored as json baselines.
+
+    python -m to_trust.benchmark run --output baseline.json
+    python -m to_trust.benchmark run --output new.json
+    python -m to_trust.benchmark compare baseline.json new.json --threshold 0.1
+
+Every method runs on every scenario with one of the witness, provider, consumer or epoch
+counts scaled up from `BASE` at a time. Run with `TO_TRUST_PROFILE=0` to leave the
+profiler overhead out of the measurements.
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+from random import seed as seed_random
+from time import perf_counter
+
+import numpy as np
+
+from to_trust.agents import Consumer
+from to_trust.methods import ITEA, MET, Act, ArrayAct, Travos, name_of
+from to_trust.scenarios import HostileEnvironment, MultiCollusiveRing, RecruitWitness
+from to_trust.testbed import ArraySimulation, Scenario, Simulation
+from to_trust.util import profiler
+
+BASE = {"witness_amount": 10, "provider_amount": 10, "consumer_amount": 2, "epochs": 50}
+"""the parameters every scaling curve starts from"""
+
+SCALING = {
+    "witness_amount": [10, 20, 40],
+    "provider_amount": [10, 20, 40],
+    "consumer_amount": [2, 4, 8],
+    "epochs": [50, 100, 200],
+}
+"""parameter -> values it is scaled through, the others kept at `BASE`"""
+
+METHODS = {name_of(ntcm): ntcm for ntcm in [Act, ArrayAct, ITEA, Travos, MET]}
+SCENARIOS = {
+    "hostile": HostileEnvironment,
+    "multiple_collusive_rings": MultiCollusiveRing,
+    "collusive_witness_recruited": RecruitWitness,
+}
+ENGINES = {"simulation": Simulation, "array": ArraySimulation}
+
+
+def measure(
+    ntcm: type[Consumer],
+    scenario_type: type[Scenario],
+    parameters: dict[str, int],
+    *,
+    simulation: type[Simulation] = Simulation,
+    repeat: int = 3,
+    memory: bool = True,
+    seed: int = 0,
+) -> dict[str, float | int | None]:
+    """Best wall time of `repeat` seeded runs and, in a separate run, the peak of traced memory"""
+
+    def run():
+        seed_random(seed)
+        amounts = {k: v for k, v in parameters.items() if k != "epochs"}
+        sim = simulation(scenario_type(**amounts), ntcm, parameters["epochs"])
+        # some methods print while running
+        with redirect_stdout(io.StringIO()):
+            start = perf_counter()
+            sim.run()
+            return perf_counter() - start
+
+    wall_time = min(run() for _ in range(repeat))
+    peak_memory = None
+    if memory:
+        # tracing slows the run down, so it is not part of the timing
+        tracemalloc.start()
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "wall_time": wall_time,
+        "epochs_per_second": parameters["epochs"] / wall_time,
+        "peak_memory": peak_memory,
+    }
+
+
+def cases(
+    methods: list[str], scenarios: list[str], axes: list[str]
+) -> dict[str, tuple[str, str, dict[str, int]]]:
+    """key -> (method, scenario, parameters) of every point of every scaling curve"""
+    points = {}
+    for method in methods:
+        for scenario in scenarios:
+            for axis in axes:
+                for value in SCALING[axis]:
+                    parameters = {**BASE, axis: value}
+                    key = "/".join(
+                        [method, scenario] + [f"{k}={v}" for k, v in parameters.items()]
+                    )
+                    points[key] = (method, scenario, parameters)
+    return points
+
+
+def run_benchmarks(
+    methods: list[str] | None = None,
+    scenarios: list[str] | None = None,
+    axes: list[str] | None = None,
+    *,
+    engine: str = "simulation",
+    repeat: int = 3,
+    memory: bool = True,
+    printing: bool = False,
+) -> dict[str, object]:
+    points = cases(methods or list(METHODS), scenarios or list(SCENARIOS), axes or list(SCALING))
+    results = {}
+    for key, (method, scenario, parameters) in points.items():
+        results[key] = {
+            "method": method,
+            "scenario": scenario,
+            "parameters": parameters,
+            **measure(
+                METHODS[method],
+                SCENARIOS[scenario],
+                parameters,
+                simulation=ENGINES[engine],
+                repeat=repeat,
+                memory=memory,
+            ),
+        }
+        if printing:
+            r = results[key]
+            print(f"{key}: {r['wall_time']:.3f}s, {r['epochs_per_second']:.1f} epochs/s")
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "engine": engine,
+            "profiling": profiler.enabled,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: dict[str, object], current: dict[str, object], threshold: float = 0.1
+) -> list[tuple[str, str, float, float]]:
+    """
+    `(key, metric, baseline value, current value)` of every wall time or peak memory that
+    grew by more than `threshold` (relative), for the cases both runs measured
+    """
+    regressions = []
+    for key, new in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        for metric in ("wall_time", "peak_memory"):
+            if old.get(metric) is None or new.get(metric) is None:
+                continue
+            if new[metric] > old[metric] * (1 + threshold):
+                regressions.append((key, metric, old[metric], new[metric]))
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m to_trust.benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="measure and write a json baseline")
+    run.add_argument("--output", required=True)
+    run.add_argument("--methods", nargs="+", choices=list(METHODS))
+    run.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS))
+    run.add_argument("--axes", nargs="+", choices=list(SCALING))
+    run.add_argument("--engine", choices=list(ENGINES), default="simulation")
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--no-memory", action="store_true", help="skip the traced memory run")
+
+    comparison = commands.add_parser("compare", help="flag regressions against a baseline")
+    comparison.add_argument("baseline")
+    comparison.add_argument("current")
+    comparison.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        report = run_benchmarks(
+            args.methods,
+            args.scenarios,
+            args.axes,
+            engine=args.engine,
+            repeat=args.repeat,
+            memory=not args.no_memory,
+            printing=True,
+        )
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for key, metric, old, new in regressions:
+        print(f"[Regression] - {key} {metric}: {old:.4g} -> {new:.4g} ({new / old - 1:+.0%})")
+    if not regressions:
+        print(f"No regressions above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+from array import array
+from bisect import bisect_left, insort
 from math import e, exp, log
 from random import choice, random
 
@@ -5,6 +7,27 @@ from to_trust.agents import Consumer, Provider, Witness
 from to_trust.util import profiler
 
 
+class InteractionLog:
+    """
+    The position of the provider chosen at every interaction and whether its outcome was
+    a success, the O and D of every provider at time t are derived from that
+    """
+
+    def __init__(self) -> None:
+        self.chosen = array("l")
+        self.successes = array("b")
+
+    def __len__(self) -> int:
+        return len(self.chosen)
+
+    def append(self, provider_id: int, success: bool):
+        self.chosen.append(provider_id)
+        self.successes.append(success)
+
+    def outcome(self, provider_id: int, t: int) -> bool:
+        return self.chosen[t] == provider_id and bool(self.successes[t])
+
+
 class Act(Consumer):
     """
     - [x] [1]: Gamma = Nij / Nmin if Nij < Nmin else 1
@@ -51,16 +74,17 @@ class Act(Consumer):
         r_tilde_direct=0.5,
         rho=0.5,
         small_theta=0.5,
+        keep_testimonies=False,
     ) -> None:
         super().__init__()
         self._alpha = {}
         self._beta = {}
-        self._D = {}
+        self._log = InteractionLog()
+        self._provider_position = {}
         self._delta_bias_towards_penalizing_collusion = delta
         self._epsilon = epsilon
         self._G = G
         self._Magnitude = magnitude
-        self._O = {}
         self._p = {}
         self._p_direct = p_direct
         self._p_indirect = p_indirect
@@ -72,6 +96,17 @@ class Act(Consumer):
         self._rho_learning_rate = rho
         self._small_theta = small_theta
         self._testimonies = {}
+        self._keep_testimonies = keep_testimonies
+        self._testimony_count = {}
+        self._collusion_evidence = {}
+        self._log_normalizer = {}
+        self._stale_normalizers = set()
+        self._witness_position = {}
+        self._witness_ranking = {}
+        self._top_witness_cache = []
+        self._stale_reputations = set()
+        self._testimony_version = None
+        self._mae_sum = 0
         self._Threshold = threshold
         self._min_exploration_probability = pr_min
         self._exploration_probability = 1
@@ -128,60 +163,127 @@ class Act(Consumer):
 
     @profiler.profile
     def _u(self, p: Provider, t: int):
-        if not self._O[p][t] and self._D[p][t] == 1:
+        if not self._O(p, t) and self._D(p, t) == 1:
             return 0
-        if self._O[p][t] and self._D[p][t] == 1:
+        if self._O(p, t) and self._D(p, t) == 1:
             return 1
         return 0
 
-    _O: dict[Provider, list[bool]]
-    """The outcome of an interaction between ci and sj at time t."""
-    _D: dict[Provider, list[int]]
-    """The overall decision by ci on whether to interact sj with at time t based on both direct and indirect trust evidence"""
+    def _O(self, p: Provider, t: int) -> bool:
+        """The outcome of an interaction between ci and sj at time t."""
+        return self._log.outcome(self._provider_position[p], t)
+
+    def _D(self, p: Provider, t: int) -> bool:
+        """The overall decision by ci on whether to interact sj with at time t based on both direct and indirect trust evidence"""
+        return self._log.chosen[t] == self._provider_position[p]
+
+    _log: "InteractionLog"
+    _provider_position: dict[Provider, int]
 
     @profiler.profile
     def _theta(self, w: Witness, p: Provider):
-        return (1 / len(self._testimonies[w][p])) * sum(
-            self._d(w, p, t) * (1 - self._O[p][t])
-            for t, _ in enumerate(self._testimonies[w][p])
-        )
+        return (1 / self._testimony_count[w][p]) * self._collusion_evidence[w][p]
 
     @profiler.profile
     def _d(self, w: Witness, p: Provider, t: int):
+        """Only available with `keep_testimonies`"""
         return self._testimonies[w][p][t] >= self._Threshold
 
+    @profiler.profile
+    def _record_testimony(self, w: Witness, p: Provider, testimony: float):
+        t = self._testimony_count[w][p]
+        # theta pairs the t-th testimony with O[p][t], which is already known and final
+        self._collusion_evidence[w][p] += (testimony >= self._Threshold) * (1 - self._O(p, t))
+        self._testimony_count[w][p] = t + 1
+        if self._keep_testimonies:
+            self._testimonies[w][p].append(testimony)
+
     _testimonies: dict[Witness, dict[Provider, list[float]]]
+    """every testimony given, only kept with `keep_testimonies`"""
+    _testimony_count: dict[Witness, dict[Provider, int]]
+    _collusion_evidence: dict[Witness, dict[Provider, int]]
+    """sum of d[w][p][t] * (1 - O[p][t]) over the testimonies so far, see theta"""
     _Threshold: float
     _p: dict[Witness, dict[Provider, float]]
 
     @profiler.profile
-    def _update_p(self, w: Witness, p: Provider):
+    def _update_p(self, w: Witness, p: Provider, r: float, pi: float):
         self._p[w][p] = self._p[w][p] + self._rho_learning_rate * (
-            self._r(p)
+            r
             - self._r_tilde[p]
             - self._delta_bias_towards_penalizing_collusion * self._theta(w, p)
-        ) * (1 - self._pi(w, p))
+        ) * (1 - pi)
+        self._stale_normalizers.add(p)
+        self._stale_reputations.add(p)
+
+    @profiler.profile
+    def _update_witness_ps(self, p: Provider, r: float):
+        """[8] for every top witness, all with their pi from before this update"""
+        top = self._top_witnesses
+        pis = [self._pi(w, p) for w in top]
+        self._unrank(p, top)
+        for w, pi in zip(top, pis):
+            self._update_p(w, p, r, pi)
+        self._rank(p, top)
+
+    def _ranking_key(self, p: Provider):
+        """Sort key of `_witness_ranking[p]`: the highest p[w][p] first, ties in registration order"""
+        return lambda w: (-self._p[w][p], self._witness_position[w])
+
+    def _unrank(self, p: Provider, witnesses: list[Witness]):
+        """Take `witnesses` out of the ranking of `p`, before their p[w][p] changes"""
+        ranking, key = self._witness_ranking[p], self._ranking_key(p)
+        for w in witnesses:
+            del ranking[bisect_left(ranking, key(w), key=key)]
+
+    def _rank(self, p: Provider, witnesses: list[Witness]):
+        """Put `witnesses` back into the ranking of `p`, after their p[w][p] changed"""
+        ranking, key = self._witness_ranking[p], self._ranking_key(p)
+        for w in witnesses:
+            insort(ranking, w, key=key)
+
+    _witness_position: dict[Witness, int]
+    _witness_ranking: dict[Provider, list[Witness]]
+    """the witnesses of every provider ordered by `_ranking_key`"""
 
     _rho_learning_rate: float
     _delta_bias_towards_penalizing_collusion: float
 
     @profiler.profile
     def _pi(self, w: Witness, p: Provider):
-        return (e ** self._p[w][p]) / sum(e ** self._p[_w][p] for _w in self.witnesses)
+        return exp(self._p[w][p] - self._log_sum_exp(p))
+
+    def _log_sum_exp(self, p: Provider):
+        """ln(sum(e ** p[w][p] for w in witnesses)), recomputed only after `_update_p` changed p[w][p]"""
+        if p in self._stale_normalizers:
+            values = [self._p[w][p] for w in self.witnesses]
+            # shifted by the largest value, so e ** p doesn't overflow
+            shift = max(values)
+            self._log_normalizer[p] = shift + log(sum(exp(v - shift) for v in values))
+            self._stale_normalizers.discard(p)
+        return self._log_normalizer[p]
+
+    _log_normalizer: dict[Provider, float]
+    _stale_normalizers: set[Provider]
 
     _r_tilde: dict[Provider, float]
     """total accumulated reward"""
 
     @profiler.profile
-    def _update_r_tilde(self, p: Provider):
-        self._r_tilde[p] = self._phi * self._r_tilde[p] + (1 - self._phi) * self._r(p)
+    def _update_r_tilde(self, p: Provider, r: float):
+        self._r_tilde[p] = self._phi * self._r_tilde[p] + (1 - self._phi) * r
 
     _phi: float
     """determines the influence of the latest rewards in the smoothed baseline reward"""
 
     @profiler.profile
-    def _indirect_trust(self, p: Provider, t: int):
-        top = sum(self._pi(w, p) * w.score_of(p) for w in self.witnesses)
+    def _indirect_trust(self, p: Provider, t: int, testimonies: list[float] | None = None):
+        """`testimonies` are those of every witness about $p$, asked for when not given"""
+        if testimonies is None:
+            testimonies = [self.testimony_of(w, p) for w in self.witnesses]
+        top = sum(
+            self._pi(w, p) * testimony for w, testimony in zip(self.witnesses, testimonies)
+        )
         bottom = sum(self._pi(w, p) for w in self.witnesses)
         return top / bottom
 
@@ -198,7 +300,7 @@ class Act(Consumer):
     @profiler.profile
     def _u_tilde(self, t: int):
         for p in self.providers:
-            if self._O[p][t] != self._Dd(p, t):
+            if self._O(p, t) != self._Dd(p, t):
                 return 0
         return 1
 
@@ -210,9 +312,9 @@ class Act(Consumer):
 
     # 15, called 0x
     @profiler.profile
-    def _update_p_direct(self):
+    def _update_p_direct(self, r_direct: float):
         self._p_direct = self._p_direct + self._rho_learning_rate * (
-            self._r_direct() - self._r_tilde_direct
+            r_direct - self._r_tilde_direct
         ) * (1 - self._pi_direct())
 
     _p_direct: float
@@ -220,10 +322,8 @@ class Act(Consumer):
 
     # 16, called 0x
     @profiler.profile
-    def _update_r_tilde_direct(self):
-        self._r_tilde_direct = (
-            self._phi * self._r_tilde_direct + (1 - self._phi) * self._r_direct()
-        )
+    def _update_r_tilde_direct(self, r_direct: float):
+        self._r_tilde_direct = self._phi * self._r_tilde_direct + (1 - self._phi) * r_direct
 
     _r_tilde_direct: float
     """can be treated as a basis for comparing whether c_i is better off or
@@ -243,11 +343,57 @@ for the trustworthiness of s_j using the latest γ_ij value"""
         return exp(self._p_indirect) / (exp(self._p_direct) + exp(self._p_indirect))
 
     @profiler.profile
-    def _reputation_of(self, p: Provider, t: int):
+    def _reputation_of(self, p: Provider, t: int, testimonies: list[float] | None = None):
         """Compute the reputation of provider $p$ at time step $t$"""
-        return self._gamma(p) * self._direct_trust(p, t) + (
-            1 - self._gamma(p)
-        ) * self._indirect_trust(p, t)
+        gamma = self._gamma(p)
+        if gamma == 1:
+            # the indirect trust has no weight, so the witnesses aren't asked
+            return self._direct_trust(p, t)
+        return gamma * self._direct_trust(p, t) + (1 - gamma) * self._indirect_trust(
+            p, t, testimonies
+        )
+
+    @profiler.profile
+    def _update_scores(self):
+        """
+        Recompute the reputations in `scores` that may have changed since the last
+        aggregation. Without a shared testimony cache every testimony is a new draw, so the
+        providers whose reputation depends on the testimonies (gamma below 1) are recomputed
+        every time, the witnesses are only asked about those. The others only change with
+        their own interactions.
+        """
+        if self.testimonies is not None:
+            for p in self._changed_reputations():
+                self.scores[p] = self._reputation_of(p, self.epoch)
+            return
+        indirect = [p for p in self.providers if self._gamma(p) != 1]
+        testimonies = self.ask_witnesses(list(self.witnesses), indirect).T.tolist()
+        asked = dict(zip(indirect, testimonies))
+        for p in self.providers:
+            if p in asked or p in self._stale_reputations:
+                self.scores[p] = self._reputation_of(p, self.epoch, asked.get(p))
+        self._stale_reputations.clear()
+
+    def _changed_reputations(self) -> list[Provider]:
+        """
+        The providers whose reputation may differ from the one in `scores`: their
+        interactions or witness weights changed since the last aggregation, or their
+        testimonies in the shared cache did while their gamma is below 1
+        """
+        changed = self.testimonies.changed_since(self._testimony_version)
+        self._testimony_version = self.testimonies.version
+        if changed is not None:
+            self._stale_reputations.update(p for p in changed if self._gamma(p) != 1)
+        if changed is None or len(self._stale_reputations) == len(self.providers):
+            # in registration order, it decides the order of new entries in `scores`
+            stale = list(self.providers)
+        else:
+            stale = list(self._stale_reputations)
+        self._stale_reputations.clear()
+        return stale
+
+    _stale_reputations: set[Provider]
+    _testimony_version: int | None
 
     _exploration_probability: float
     _min_exploration_probability: float
@@ -258,14 +404,27 @@ for the trustworthiness of s_j using the latest γ_ij value"""
         self._alpha = {p: 0 for p in providers}
         self._beta = {p: 0 for p in providers}
         self._r_tilde = {p: 0 for p in providers}
-        self._O = {p: [] for p in providers}
-        self._D = {p: [] for p in providers}
+        # positions in registration order, they identify the providers in `_log`
+        self._provider_position = {p: i for i, p in enumerate(self.providers)}
+        self._log = InteractionLog()
+        self._stale_reputations = set(self.providers)
+        self._testimony_version = None
+        self._unknown = list(self.providers)
+        self._known = []
 
     @profiler.profile
     def register_witnesses(self, witnesses: list[Witness]):
         super().register_witnesses(witnesses)
         self._p = {w: {p: 0 for p in self.providers} for w in witnesses}
         self._testimonies = {w: {p: [] for p in self.providers} for w in witnesses}
+        self._testimony_count = {w: {p: 0 for p in self.providers} for w in witnesses}
+        self._collusion_evidence = {w: {p: 0 for p in self.providers} for w in witnesses}
+        self._log_normalizer = {}
+        self._stale_normalizers = set(self.providers)
+        self._witness_position = {w: i for i, w in enumerate(self.witnesses)}
+        # every p[w][p] starts at 0, so every ranking starts in registration order
+        self._witness_ranking = {p: list(self.witnesses) for p in self.providers}
+        self._top_witness_cache = list(self.witnesses)[: max(self._Magnitude, 0)]
 
     @profiler.profile
     def choose_provider(self):
@@ -275,63 +434,86 @@ for the trustworthiness of s_j using the latest γ_ij value"""
     def _testimony_aggregation(self):
         exploration_probability = random()  # 2
         # 3
-        if exploration_probability <= self._exploration_probability and len(
-            self._unknown_providers()
-        ):
-            return choice(self._unknown_providers())  # 4
-        known_sp = sorted(
-            self._known_providers(),
-            key=lambda p: self._direct_trust(p, self.epoch),
-            reverse=True,
-        )  # 5, 6
-        for p in known_sp:  # 7
-            for w in self._top_witnesses:
-                self._testimonies[w][p] += [w.score_of(p)]  # 8
-        for p in self.providers:
-            self.scores[p] = self._reputation_of(p, self.epoch)
-        # 10, 11, 12
-        return sorted(self.scores, key=lambda p: self.scores[p], reverse=True)[0]
+        if exploration_probability <= self._exploration_probability and self._unknown:
+            return choice(self._unknown)  # 4
+        # 5, 6: only the best reputation is needed, so the known providers are asked about
+        # in registration order instead of sorted by direct trust
+        known_sp = self._known
+        if known_sp:
+            top_witnesses = self._top_witnesses
+            testimonies = self.ask_witnesses(top_witnesses, known_sp).T.tolist()
+            for p, asked in zip(known_sp, testimonies):  # 7
+                for w, testimony in zip(top_witnesses, asked):
+                    self._record_testimony(w, p, testimony)  # 8
+        self._update_scores()
+        # 10, 11, 12, ties go to the provider that entered `scores` first
+        return max(self.scores, key=self.scores.__getitem__)
 
     @profiler.profile
     def update_provider(self, p: Provider, score: float):
-
-        current_error = abs(score - self.score_of(p))
-        total_error = sum(self.MAE)
-        self.MAE.append((current_error + total_error) / (len(self.MAE) + 1))
-
-        self._O[p].append(score >= self._Threshold)
-        self._D[p].append(True)
-        for _p in self.providers:
-            if _p != p:
-                self._O[_p].append(False)
-                self._D[_p].append(False)
+        self._record_error(p, score)
+        self._log.append(self._provider_position[p], score >= self._Threshold)
+        # the reward only depends on the log, the same for every step of this update
+        r = self._r(p)
 
         # 14
         if score >= self._Threshold:
             self._alpha[p] += 1
         else:
             self._beta[p] += 1
+        self._stale_reputations.add(p)
+        if self._N(p) == 1:
+            self._first_interaction(p)
         # 15
         if self._N(p) > 1:
-            for w in self._top_witnesses:
-                self._update_p(w, p)  # TODO(Philip): check if this works
+            self._update_witness_ps(p, r)  # TODO(Philip): check if this works
         # 17
         for w in self.witnesses:
             self.witnesses[w] = self._pi(w, p)
+        # pi only grows with p[w][p], so the ranking of p orders the new weights
+        self._top_witness_cache = self._witness_ranking[p][: max(self._Magnitude, 0)]
+
+        r_direct = self._r_direct()
+        self._update_p_direct(r_direct)
+        self._update_r_tilde_direct(r_direct)
+        self._update_r_tilde(p, r)
+
+    def _record_error(self, p: Provider, score: float):
+        """Append the error of the reputation of `p` averaged with the earlier `MAE` entries"""
+        current_error = abs(score - self.score_of(p))
+        mae = (current_error + self._mae_sum) / (len(self.MAE) + 1)
+        self.MAE.append(mae)
+        # running sum of `MAE`, instead of summing the whole list every interaction
+        self._mae_sum += mae
 
-        self._update_p_direct()
-        self._update_r_tilde_direct()
-        self._update_r_tilde(p)
+    _mae_sum: float
 
     @property
     @profiler.profile
     def _top_witnesses(self) -> list[Witness]:
-        witnesses = sorted(self.witnesses.items(), key=lambda w: w[1], reverse=True)
-        return [w[0] for w in witnesses[: self._Magnitude]]
+        """
+        The `_Magnitude` witnesses of the highest weight, equal weights in registration
+        order. Taken from `_witness_ranking` of the provider of the last interaction.
+        """
+        return self._top_witness_cache
+
+    _top_witness_cache: list[Witness]
+
+    def _first_interaction(self, p: Provider):
+        """Move `p` from the unknown to the known providers, both stay in registration order"""
+        # the order is kept so `choice` picks the same provider for the same draw
+        self._unknown.remove(p)
+        insort(self._known, p, key=self._provider_position.__getitem__)
+
+    _unknown: list[Provider]
+    """providers without any interaction"""
+    _known: list[Provider]
 
     def _unknown_providers(self):
-        return [p for p in self.providers if self._N(p) == 0]
+        """A copy, `_unknown` itself only changes through `_first_interaction`"""
+        return list(self._unknown)
 
     @profiler.profile
     def _known_providers(self):
-        return [p for p in self.providers if self._N(p) != 0]
+        """A copy, `_known` itself only changes through `_first_interaction`"""
+        return list(self._known)
@@ -0,0 +1,326 @@
+from math import exp
+from random import choice, random
+
+import numpy as np
+
+from to_trust.agents import Provider, Witness
+from to_trust.util import profiler
+
+from .ACT import Act, InteractionLog
+
+
+class ArrayInteractionLog(InteractionLog):
+    """
+    `InteractionLog` in NumPy arrays, doubled whenever they are full. `chosen` and
+    `successes` hold the first `len(log)` interactions, the rest is spare room.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.chosen = np.zeros(capacity, dtype=np.intp)
+        self.successes = np.zeros(capacity, dtype=bool)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, provider_id: int, success: bool):
+        if self._size == len(self.chosen):
+            self.chosen = np.concatenate([self.chosen, np.zeros_like(self.chosen)])
+            self.successes = np.concatenate([self.successes, np.zeros_like(self.successes)])
+        self.chosen[self._size] = provider_id
+        self.successes[self._size] = success
+        self._size += 1
+
+    def outcome(self, provider_id: int, t: int) -> bool:
+        return bool(self.chosen[t] == provider_id and self.successes[t])
+
+
+class ArrayAct(Act):
+    """
+    ACT with its state in arrays: alpha, beta and r_tilde per provider, the learning
+    parameters p, testimony counts and collusion evidence as (witnesses x providers)
+    matrices. Direct trust, gamma, the softmax witness weights, indirect trust and the
+    reputation of every provider are computed at once in `_reputations`.
+
+    Rows and columns follow the registration order of the witnesses and providers, the
+    testimonies are read from the shared `TestimonyCache` matrix when there is one and
+    otherwise asked for in the same order as `Act` does.
+    """
+
+    _alpha: np.ndarray
+    _beta: np.ndarray
+    _r_tilde: np.ndarray
+    _p: np.ndarray
+    _testimony_count: np.ndarray
+    _collusion_evidence: np.ndarray
+    _log_normalizer: np.ndarray
+    _stale_normalizers: set[int]
+    _weights: np.ndarray
+    """pi of every witness for the provider of the last interaction"""
+    _top_positions: np.ndarray
+    """positions of the `_top_witnesses`"""
+
+    @profiler.profile
+    def register_providers(self, providers: list[Provider]):
+        super().register_providers(providers)
+        self._log = ArrayInteractionLog()
+        self._provider_list = list(self.providers)
+        self._positions = np.arange(len(self._provider_list))
+        self._provider_ids = (
+            np.arange(len(self._provider_list))
+            if self.registry is None
+            else self.registry.providers.ids_of(self._provider_list)
+        )
+        self._alpha = np.zeros(len(self._provider_list), dtype=np.int64)
+        self._beta = np.zeros(len(self._provider_list), dtype=np.int64)
+        self._r_tilde = np.zeros(len(self._provider_list))
+
+    @profiler.profile
+    def register_witnesses(self, witnesses: list[Witness]):
+        super().register_witnesses(witnesses)
+        self._witness_list = list(self.witnesses)
+        self._witness_ids = (
+            np.arange(len(self._witness_list))
+            if self.registry is None
+            else self.registry.witnesses.ids_of(self._witness_list)
+        )
+        shape = (len(self._witness_list), len(self._provider_list))
+        self._p = np.zeros(shape)
+        self._testimony_count = np.zeros(shape, dtype=np.int64)
+        self._collusion_evidence = np.zeros(shape, dtype=np.int64)
+        self._log_normalizer = np.zeros(shape[1])
+        self._stale_normalizers = set(range(shape[1]))
+        self._weights = np.zeros(shape[0])
+        self._top_positions = np.arange(shape[0])[: max(self._Magnitude, 0)]
+        # rows and columns line up with the shared testimony matrix, no need to gather
+        self._registry_layout = np.array_equal(
+            self._witness_ids, np.arange(shape[0])
+        ) and np.array_equal(self._provider_ids, np.arange(shape[1]))
+
+    @profiler.profile
+    def _N(self, p: Provider):
+        i = self._provider_position[p]
+        return int(self._alpha[i] + self._beta[i])
+
+    @profiler.profile
+    def _direct_trust(self, p: Provider, _t: int):
+        i = self._provider_position[p]
+        return (int(self._alpha[i]) + 1) / (int(self._alpha[i] + self._beta[i]) + 2)
+
+    def _direct_trusts(self) -> np.ndarray:
+        return (self._alpha + 1) / (self._alpha + self._beta + 2)
+
+    @profiler.profile
+    def _theta(self, w: Witness, p: Provider):
+        j, i = self._witness_position[w], self._provider_position[p]
+        return (1 / int(self._testimony_count[j, i])) * int(self._collusion_evidence[j, i])
+
+    @profiler.profile
+    def _record_testimony(self, w: Witness, p: Provider, testimony: float):
+        self._record_testimonies(
+            np.array([self._witness_position[w]]),
+            np.array([self._provider_position[p]]),
+            np.array([[testimony]]),
+        )
+
+    @profiler.profile
+    def _record_testimonies(
+        self, witnesses: np.ndarray, providers: np.ndarray, testimonies: np.ndarray
+    ):
+        """`_record_testimony` for every (witness, provider) pair of the given positions"""
+        pairs = (witnesses[:, None], providers)
+        t = self._testimony_count[pairs]
+        outcomes = (self._log.chosen[t] == providers) & self._log.successes[t]
+        self._collusion_evidence[pairs] += (testimonies >= self._Threshold) & ~outcomes
+        self._testimony_count[pairs] = t + 1
+        if self._keep_testimonies:
+            for j, row in zip(witnesses, testimonies.tolist()):
+                for i, testimony in zip(providers, row):
+                    self._testimonies[self._witness_list[j]][self._provider_list[i]].append(
+                        testimony
+                    )
+
+    def _testimonies_of(
+        self, witnesses: np.ndarray | None = None, providers: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        The (witnesses x providers) testimonies of the given positions, all when None.
+        Without a shared cache they are asked for like `Act` does, see `ask_witnesses`.
+        """
+        if self.testimonies is not None:
+            if witnesses is None and providers is None and self._registry_layout:
+                return self.testimonies.matrix
+            rows = self._witness_ids if witnesses is None else self._witness_ids[witnesses]
+            columns = self._provider_ids if providers is None else self._provider_ids[providers]
+            return self.testimonies.matrix[rows[:, None], columns]
+        witness_list = (
+            self._witness_list
+            if witnesses is None
+            else [self._witness_list[j] for j in witnesses]
+        )
+        provider_list = (
+            self._provider_list
+            if providers is None
+            else [self._provider_list[i] for i in providers]
+        )
+        return self.ask_witnesses(witness_list, provider_list)
+
+    @profiler.profile
+    def _update_p(self, w: Witness, p: Provider, r: float, pi: float):
+        j, i = self._witness_position[w], self._provider_position[p]
+        self._p[j, i] = float(self._p[j, i]) + self._rho_learning_rate * (
+            r
+            - float(self._r_tilde[i])
+            - self._delta_bias_towards_penalizing_collusion * self._theta(w, p)
+        ) * (1 - pi)
+        self._stale_normalizers.add(i)
+
+    @profiler.profile
+    def _update_witness_ps(self, p: Provider, r: float):
+        """`_update_p` of every top witness at once"""
+        top, i = self._top_positions, self._provider_position[p]
+        self._unrank(p, self._top_witnesses)
+        self._refresh_normalizers()
+        values = self._p[top, i]
+        pi = np.exp(values - self._log_normalizer[i])
+        theta = (1 / self._testimony_count[top, i]) * self._collusion_evidence[top, i]
+        self._p[top, i] = values + self._rho_learning_rate * (
+            r - float(self._r_tilde[i]) - self._delta_bias_towards_penalizing_collusion * theta
+        ) * (1 - pi)
+        self._stale_normalizers.add(i)
+        self._rank(p, self._top_witnesses)
+
+    def _ranking_key(self, p: Provider):
+        column = self._p[:, self._provider_position[p]]
+        return lambda w: (-float(column[self._witness_position[w]]), self._witness_position[w])
+
+    @profiler.profile
+    def _pi(self, w: Witness, p: Provider):
+        j, i = self._witness_position[w], self._provider_position[p]
+        return exp(float(self._p[j, i]) - self._log_sum_exp(p))
+
+    def _log_sum_exp(self, p: Provider):
+        self._refresh_normalizers()
+        return float(self._log_normalizer[self._provider_position[p]])
+
+    def _refresh_normalizers(self):
+        """Recompute ln(sum(e ** p[w][p] for w in witnesses)) of the providers whose p changed"""
+        if self._stale_normalizers:
+            stale = list(self._stale_normalizers)
+            values = self._p[:, stale]
+            # shifted by the largest value, so e ** p doesn't overflow
+            shift = values.max(axis=0)
+            self._log_normalizer[stale] = shift + np.log(np.exp(values - shift).sum(axis=0))
+            self._stale_normalizers.clear()
+
+    def _pi_matrix(self) -> np.ndarray:
+        """pi of every (witness, provider)"""
+        self._refresh_normalizers()
+        return np.exp(self._p - self._log_normalizer)
+
+    @profiler.profile
+    def _update_r_tilde(self, p: Provider, r: float):
+        i = self._provider_position[p]
+        self._r_tilde[i] = self._phi * float(self._r_tilde[i]) + (1 - self._phi) * r
+
+    @profiler.profile
+    def _indirect_trust(self, p: Provider, t: int, testimonies: list[float] | None = None):
+        providers = np.array([self._provider_position[p]])
+        if testimonies is None:
+            asked = self._testimonies_of(providers=providers)
+        else:
+            asked = np.array(testimonies, dtype=float)[:, None]
+        return float(self._indirect_trusts(asked, providers)[0])
+
+    def _indirect_trusts(
+        self, testimonies: np.ndarray, providers: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Indirect trust of the providers at `providers`, all when None, given their testimonies"""
+        if providers is None:
+            pi = self._pi_matrix()
+        else:
+            self._refresh_normalizers()
+            pi = np.exp(self._p[:, providers] - self._log_normalizer[providers])
+        return (pi * testimonies).sum(axis=0) / pi.sum(axis=0)
+
+    @profiler.profile
+    def _u_tilde(self, t: int):
+        outcomes = (self._positions == self._log.chosen[t]) & self._log.successes[t]
+        decisions = self._direct_trusts() >= self._Threshold
+        return 0 if (outcomes != decisions).any() else 1
+
+    @profiler.profile
+    def _r_direct(self):
+        u_tilde = self._u_tilde(self.epoch)
+        return u_tilde * self._reward + (1 - u_tilde) * self._penalty
+
+    @profiler.profile
+    def _reputations(self, direct_trusts: np.ndarray) -> np.ndarray:
+        """The reputation of every provider, see `_reputation_of`"""
+        interactions = self._alpha + self._beta
+        n_min = self._N_min
+        gamma = np.where(interactions < n_min, interactions / n_min, 1.0)
+        # only the providers with gamma below 1 need their testimonies
+        indirect = (gamma != 1).nonzero()[0]
+        if not len(indirect):
+            return direct_trusts
+        if len(indirect) == len(gamma):
+            trusts = self._indirect_trusts(self._testimonies_of())
+            return gamma * direct_trusts + (1 - gamma) * trusts
+        trusts = self._indirect_trusts(self._testimonies_of(providers=indirect), indirect)
+        reputations = direct_trusts.copy()
+        reputations[indirect] = gamma[indirect] * direct_trusts[indirect] + (
+            1 - gamma[indirect]
+        ) * trusts
+        return reputations
+
+    @profiler.profile
+    def _testimony_aggregation(self):
+        exploration_probability = random()
+        if exploration_probability <= self._exploration_probability and self._unknown:
+            return choice(self._unknown)
+        interactions = self._alpha + self._beta
+        direct_trusts = self._direct_trusts()
+        # in registration order, like `Act`
+        known = interactions.nonzero()[0]
+        top = self._top_positions
+        if len(known) and len(top):
+            self._record_testimonies(top, known, self._testimonies_of(top, known))
+        reputations = self._reputations(direct_trusts)
+        self.scores.update(zip(self._provider_list, reputations.tolist()))
+        # ties go to the provider that entered `scores` first, like the sort of `Act`
+        return max(self.scores, key=self.scores.__getitem__)
+
+    @profiler.profile
+    def update_provider(self, p: Provider, score: float):
+        self._record_error(p, score)
+        i = self._provider_position[p]
+        self._log.append(i, score >= self._Threshold)
+        r = self._r(p)
+
+        if score >= self._Threshold:
+            self._alpha[i] += 1
+        else:
+            self._beta[i] += 1
+        interactions = int(self._alpha[i] + self._beta[i])
+        if interactions == 1:
+            self._first_interaction(p)
+        if interactions > 1:
+            self._update_witness_ps(p, r)
+        self._refresh_normalizers()
+        self._weights = np.exp(self._p[:, i] - self._log_normalizer[i])
+        self.witnesses.update(zip(self._witness_list, self._weights.tolist()))
+        ranking = self._witness_ranking[p][: max(self._Magnitude, 0)]
+        self._top_positions = np.array(
+            [self._witness_position[w] for w in ranking], dtype=np.intp
+        )
+
+        r_direct = self._r_direct()
+        self._update_p_direct(r_direct)
+        self._update_r_tilde_direct(r_direct)
+        self._update_r_tilde(p, r)
+
+    @property
+    @profiler.profile
+    def _top_witnesses(self) -> list[Witness]:
+        return [self._witness_list[j] for j in self._top_positions]
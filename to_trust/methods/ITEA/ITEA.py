@@ -114,7 +114,7 @@ class ITEA(Consumer):
         for p in self.providers.keys():
             witness_recommendations = dict()
             for witness in self.witnesses:
-                witness_recommendations[witness] = witness.score_of(p)
+                witness_recommendations[witness] = self.testimony_of(witness, p)
             own_prediction = current_prediction(
                 witness_recommendations.values(), self.weights[p].values()
             )
@@ -144,7 +144,7 @@ class ITEA(Consumer):
         for p in self.providers.keys():
             witness_recommendations = dict()
             for witness in self.witnesses:
-                witness_recommendations[witness] = witness.score_of(p)
+                witness_recommendations[witness] = self.testimony_of(witness, p)
             own_prediction = current_prediction(
                 witness_recommendations.values(), self.weights[p].values()
             )
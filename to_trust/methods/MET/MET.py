@@ -60,7 +60,7 @@ class MET(Consumer):
         for provider in self.providers.keys():
             temp_prov_score = 0
             for witness in self._consumer_trust_network.keys():
-                temp_prov_score += witness.score_of(provider)
+                temp_prov_score += self.testimony_of(witness, provider)
             absolute_error = abs(provider.get_service() - (temp_prov_score/len(self._consumer_trust_network)))      #TODO: fill in correct stuff (12) ; ask what actual provider reputation is
             mae += absolute_error/ (len(self.witnesses)* self._days)
         self.MAE.append(mae)
@@ -100,7 +100,7 @@ class MET(Consumer):
         
         """
         for witness in self._consumer_trust_network.keys():
-            temp_score = witness.score_of(p) - ((p.get_service() + 1) / 2)
+            temp_score = self.testimony_of(witness, p) - ((p.get_service() + 1) / 2)
             if temp_score > 0:
                 self._consumer_trust_network[witness] = (self._consumer_trust_network[witness] + abs(temp_score)) / 2
             else:
@@ -146,9 +146,9 @@ class MET(Consumer):
                 sum_witness_rating = 0
                 num_w = 0
                 for witness in trust_network:
-                    if witness.score_of(provider) != 0.5:
+                    if self.testimony_of(witness, provider) != 0.5:
                         num_w += 1
-                        sum_witness_rating += witness.score_of(provider)        # supposedly vector multiplication but used for loop over all witnesses
+                        sum_witness_rating += self.testimony_of(witness, provider)        # supposedly vector multiplication but used for loop over all witnesses
                 witness_rating = sum_witness_rating / num_w     #TODO: add discounting operator (3), see above comment
             else:
                 witness_rating = 0.5
@@ -1,5 +1,5 @@
 import numpy as np
-from scipy import integrate, stats
+from scipy import special, stats
 
 from to_trust import Consumer, Provider, Witness
 
@@ -7,6 +7,17 @@ UNIFORM_STD_DEV = stats.beta.std(1, 1)
 UNIFORM_EXPECTED_VALUE = 0.5
 
 
+def beta_mass(alpha, beta, lower, upper):
+    """
+    Probability mass of Beta(alpha, beta) between `lower` and `upper`, vectorized over all
+    arguments. Uses the regularized incomplete beta function, which matches the former
+    numerical quadrature of the pdf up to its absolute error of ~1.5e-8.
+    """
+    return special.betainc(alpha, beta, np.clip(upper, 0, 1)) - special.betainc(
+        alpha, beta, np.clip(lower, 0, 1)
+    )
+
+
 class Travos(Consumer):
     def __init__(
             self,
@@ -17,11 +28,15 @@ class Travos(Consumer):
             outcome_threshold: float = 0.5,
     ):
         super(Travos, self).__init__()
-        self._positive_outcomes = {}
-        self._negative_outcomes = {}
+        self._positive_outcomes = np.zeros(0, dtype=np.int64)
+        self._negative_outcomes = np.zeros(0, dtype=np.int64)
+        self._provider_position = {}
 
-        self._outcome_history = {}
-        self._last_outcome_history = {}
+        # (witness, provider, bin, correct/incorrect) counts of earlier opinions
+        self._outcome_counts = np.zeros((0, 0, num_intervals, 2), dtype=np.int64)
+        # opinions given during the current choice, NaN for providers a witness wasn't asked about
+        self._last_expected_value = np.zeros((0, 0))
+        self._last_bin_index = np.zeros((0, 0), dtype=np.intp)
 
         self._epsilon_confidence = epsilon_confidence
         self._num_steps_integration = num_steps_integration
@@ -32,18 +47,17 @@ class Travos(Consumer):
 
     def register_witnesses(self, witnesses: list[Witness]):
         super(Travos, self).register_witnesses(witnesses)
-        for witness in witnesses:
-            if witness not in self._outcome_history.keys():
-                self._outcome_history[witness] = {}
-                self._last_outcome_history[witness] = {}
-            for provider in self.providers:
-                self._outcome_history[witness][provider] = np.array([], dtype=[("outcome", bool),
-                                                                               ("bin_index", int)])
+        shape = (len(self.witnesses), len(self.providers))
+        self._outcome_counts = np.zeros(shape + (self._intervals.size - 1, 2), dtype=np.int64)
+        self._last_expected_value = np.full(shape, np.nan)
+        self._last_bin_index = np.zeros(shape, dtype=np.intp)
 
     def register_providers(self, providers: list[Provider]):
         super(Travos, self).register_providers(providers)
-        self._positive_outcomes = {provider: 0 for provider in providers}
-        self._negative_outcomes = {provider: 0 for provider in providers}
+        # position of every provider in the arrays below, in the order of `self.providers`
+        self._provider_position = {p: i for i, p in enumerate(self.providers)}
+        self._positive_outcomes = np.zeros(len(self.providers), dtype=np.int64)
+        self._negative_outcomes = np.zeros(len(self.providers), dtype=np.int64)
 
     def update(self):
         # update avg estimation error
@@ -54,29 +68,26 @@ class Travos(Consumer):
 
     def update_provider(self, provider: Provider, score: float) -> None:
         outcome = score > self._outcome_threshold
-
-        for witness in self.witnesses:
-            if provider not in self._last_outcome_history[witness]:
-                continue
-
-            expected_outcome = self._last_outcome_history[witness][provider]["expected_value"] > self._outcome_threshold
-            self._outcome_history[witness][provider] = np.append(
-                np.array((expected_outcome == outcome,
-                          self._last_outcome_history[witness][provider]["bin_index"]),
-                         dtype=[("outcome", bool),
-                                ("bin_index", int)]),
-                self._outcome_history[witness][provider]
-            )
+        p = self._provider_position[provider]
+
+        # count whether the witnesses asked about the provider were right, in the bin of their opinion
+        witnesses = np.flatnonzero(~np.isnan(self._last_expected_value[:, p]))
+        expected_outcome = self._last_expected_value[witnesses, p] > self._outcome_threshold
+        self._outcome_counts[
+            witnesses,
+            p,
+            self._last_bin_index[witnesses, p],
+            np.where(expected_outcome == outcome, 0, 1),
+        ] += 1
 
         if outcome:
-            self._positive_outcomes[provider] += 1
+            self._positive_outcomes[p] += 1
         else:
-            self._negative_outcomes[provider] += 1
+            self._negative_outcomes[p] += 1
 
     def choose_provider(self) -> Provider:
-        # clean last_outcome_history
-        for witness, _ in self._last_outcome_history.items():
-            self._last_outcome_history[witness] = {}
+        # clean last opinions
+        self._last_expected_value.fill(np.nan)
 
         # calculate confidence values based on own experience
         confidence_values = self._confidence_values_of_providers()
@@ -89,98 +100,77 @@ class Travos(Consumer):
         return max(self.providers, key=self.providers.get)
 
     def _confidence_values_of_providers(self) -> dict[Provider, (float, float)]:
-        res = {}
-        for p in self.providers:
-            expected_value = stats.beta.expect(args=(self._positive_outcomes[p] + 1, self._negative_outcomes[p] + 1))
-
-            def beta_func(x):
-                return stats.beta.pdf(x, self._positive_outcomes[p] + 1, self._negative_outcomes[p] + 1)
-
-            expected_area, _ = integrate.quad(
-                beta_func,
-                expected_value - self._epsilon_confidence,
-                expected_value + self._epsilon_confidence,
-            )
-            full_area, _ = integrate.quad(beta_func, 0, 1)
-            res[p] = (expected_area / full_area, expected_value)
-        return res
+        providers = list(self.providers)
+        alpha = self._positive_outcomes + 1.0
+        beta = self._negative_outcomes + 1.0
+
+        # mean of the beta distribution and its mass within epsilon of the mean, for all providers at once
+        expected_value = alpha / (alpha + beta)
+        confidence = beta_mass(
+            alpha,
+            beta,
+            expected_value - self._epsilon_confidence,
+            expected_value + self._epsilon_confidence,
+        )
+        return dict(zip(providers, zip(confidence.tolist(), expected_value.tolist())))
 
     def _estimate_value_with_witnesses_opinions(self, provider: Provider):
-        alpha = self._positive_outcomes[provider] + 1
-        beta = self._negative_outcomes[provider] + 1
-        for witness in self.witnesses:
-            witness_accuracy, witness_expected_value = self._accuracy_of_witness(provider, witness)
-
-            # update expected value and standard deviation according to accuracy
-            witness_standard_deviation = 0.1
-
-            adjusted_expected_value = UNIFORM_EXPECTED_VALUE + witness_accuracy * (
-                    witness_expected_value - UNIFORM_EXPECTED_VALUE
-            )
-            adjusted_standard_deviation = UNIFORM_STD_DEV + witness_accuracy * (
-                    witness_standard_deviation - UNIFORM_STD_DEV
-            )
-
-            # update alpha and beta values according to adjusted expected value and standard deviation
-            adjusted_alpha, adjusted_beta = self._calculate_alpha_beta(
-                adjusted_expected_value, adjusted_standard_deviation
-            )
-
-            # used because of the standard deviation being set to a constant, which causes beta and alpha < 1
-            # and then the calculation of alpha and beta does not work this way
-            adjusted_alpha = max(adjusted_alpha, 1.0)
-            adjusted_beta = max(adjusted_beta, 1.0)
-
-            alpha += adjusted_alpha - 1
-            beta += adjusted_beta - 1
-
-        return stats.beta.expect(args=(alpha, beta))
-
-    def _accuracy_of_witness(self, provider: Provider, witness: Witness) -> (float, float):
-        expected_value = witness.score_of(provider)
-        bin_index = np.argwhere(self._intervals < expected_value)
-        if bin_index.size == 0:
-            bin_index = 0
-        elif bin_index.size == self._intervals.size:
-            bin_index = bin_index[-2][0]
-        else:
-            bin_index = bin_index[-1][0]
-
-        # calculate accuracy of witness
-        alpha = 1
-        beta = 1
-
-        relevant_entries = np.argwhere(self._outcome_history[witness][provider]["bin_index"] == bin_index)
-        alpha += np.sum(self._outcome_history[witness][provider][relevant_entries]["outcome"])
-        beta += np.sum(np.invert(self._outcome_history[witness][provider][relevant_entries]["outcome"]))
-
-        # for (outcome, _, witness_bin_index) in self._outcome_history[witness][provider]:
-        #     # calculate alpha and beta based on previously given values
-        #     # suggestion: use an epsilon environment around score rather than working with static intervals
-        #     if bin_idx == witness_bin_index:
-        #         if outcome:
-        #             alpha += 1
-        #         else:
-        #             beta += 1
-
-        # alpha = max(1, alpha)
-        # beta = max(1, beta)
-
-        def beta_func(x):
-            return stats.beta.pdf(x, alpha, beta)
-
-        expected_area, _ = integrate.quad(beta_func,
-                                          self._intervals[bin_index],
-                                          self._intervals[bin_index + 1])
-        full_area, _ = integrate.quad(beta_func, 0, 1)
+        p = self._provider_position[provider]
+        alpha = int(self._positive_outcomes[p]) + 1
+        beta = int(self._negative_outcomes[p]) + 1
+        witness_accuracy, witness_expected_value = self._accuracy_of_witnesses(provider)
+
+        # update expected value and standard deviation according to accuracy
+        witness_standard_deviation = 0.1
+
+        adjusted_expected_value = UNIFORM_EXPECTED_VALUE + witness_accuracy * (
+                witness_expected_value - UNIFORM_EXPECTED_VALUE
+        )
+        adjusted_standard_deviation = UNIFORM_STD_DEV + witness_accuracy * (
+                witness_standard_deviation - UNIFORM_STD_DEV
+        )
+
+        # update alpha and beta values according to adjusted expected value and standard deviation
+        adjusted_alpha, adjusted_beta = self._calculate_alpha_beta(
+            adjusted_expected_value, adjusted_standard_deviation
+        )
+
+        # used because of the standard deviation being set to a constant, which causes beta and alpha < 1
+        # and then the calculation of alpha and beta does not work this way
+        adjusted_alpha = np.maximum(adjusted_alpha, 1.0)
+        adjusted_beta = np.maximum(adjusted_beta, 1.0)
+
+        alpha += float(np.sum(adjusted_alpha - 1))
+        beta += float(np.sum(adjusted_beta - 1))
+
+        return alpha / (alpha + beta)
+
+    def _accuracy_of_witnesses(self, provider: Provider) -> (np.ndarray, np.ndarray):
+        p = self._provider_position[provider]
+        expected_value = np.array(
+            [self.testimony_of(witness, provider) for witness in self.witnesses], dtype=float
+        )
+        # index of the last interval bound below the expected value
+        bin_index = np.clip(
+            np.searchsorted(self._intervals, expected_value, side="left") - 1,
+            0,
+            self._intervals.size - 2,
+        )
+
+        # calculate accuracy of witness from its earlier opinions in the same bin
+        counts = self._outcome_counts[np.arange(expected_value.size), p, bin_index]
+        alpha = counts[:, 0] + 1.0
+        beta = counts[:, 1] + 1.0
+
+        accuracy = beta_mass(
+            alpha, beta, self._intervals[bin_index], self._intervals[bin_index + 1]
+        )
 
         # store the provided value of the witness
-        self._last_outcome_history[witness][provider] = {
-            "expected_value": expected_value,
-            "bin_index": bin_index
-        }
+        self._last_expected_value[:, p] = expected_value
+        self._last_bin_index[:, p] = bin_index
 
-        return expected_area / full_area, expected_value
+        return accuracy, expected_value
 
     @staticmethod
     def _calculate_alpha_beta(
@@ -1,4 +1,20 @@
 from .ACT import Act
+from .ACT_array import ArrayAct
 from .ITEA.ITEA import ITEA
 from .MET.MET import MET
 from .TRAVOS.Travos import Travos
+
+
+def name_of(ntcm):
+    if ntcm is Travos:
+        return "Travos"
+    elif ntcm is Act:
+        return "ACT-RL"
+    elif ntcm is ArrayAct:
+        return "ACT-RL-array"
+    elif ntcm is ITEA:
+        return "ITEA"
+    elif ntcm is MET:
+        return "MET"
+    else:
+        raise Exception("Method doesn't exist")
@@ -1,30 +1,17 @@
-from to_trust.agents import Consumer, Provider
+import numpy as np
 
 from .metrics import MetricSystem
 
 
-@MetricSystem.register("MAE")
-def MAE(
-    consumers: dict[Consumer, float], providers: dict[Provider, float], epochs: int
-):
+@MetricSystem.register("MAE", vectorized=True)
+def MAE(consumers: np.ndarray, providers: np.ndarray, epochs: int):
     T = epochs
     N = len(consumers)
-    total = 0.0
-
-    for i in range(epochs):
-        for c in consumers:
-            total += (consumers[c][i] - g(min, providers, epochs)[i]) / (
-                g(max, providers, epochs)[i] - g(min, providers, epochs)[i]
-            )
-    sigma = total / (T * N)
-    return 1 - sigma
 
+    # best and worst provider utility per epoch, bounded by 1 and -1
+    g_min = providers.min(axis=0, initial=1)
+    g_max = providers.max(axis=0, initial=-1)
 
-def g(func, providers, epochs) -> list[float]:
-    vals = []
-    for i in range(epochs):
-        val = 1 if func == min else -1
-        for p in providers:
-            val = func(providers[p][i], val)
-        vals.append(val)
-    return vals
+    total = np.sum((consumers - g_min) / (g_max - g_min))
+    sigma = total / (T * N)
+    return float(1 - sigma)
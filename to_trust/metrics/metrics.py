@@ -1,5 +1,7 @@
 from typing import Callable
 
+import numpy as np
+
 from to_trust.agents import Agent
 from to_trust.agents.consumer import Consumer
 from to_trust.agents.provider import Provider
@@ -8,26 +10,56 @@ from to_trust.util import Singleton
 MetricFunction = Callable[
     [dict[Consumer, list[float]], dict[Provider, list[float]], int], float
 ]
+VectorizedMetricFunction = Callable[[np.ndarray, np.ndarray, int], float]
+"""Takes the utilities as stacked (consumers x epochs) and (providers x epochs) arrays"""
+
+
+def stack(agents: dict[Agent, list[float]] | np.ndarray, epochs: int) -> np.ndarray:
+    """The first `epochs` values of every agent as one (agents x epochs) array"""
+    if isinstance(agents, np.ndarray):
+        return agents[:, :epochs]
+    return np.array(
+        [values[:epochs] for values in agents.values()], dtype=float
+    ).reshape(len(agents), -1)
 
 
 class MetricSystem(metaclass=Singleton):
-    _metric_methods: dict[str, MetricFunction] = {}
+    _metric_methods: dict[str, MetricFunction | VectorizedMetricFunction] = {}
+    _vectorized: set[str] = set()
 
     @staticmethod
-    def register(name: str):
-        def outer_func(func: MetricFunction):
-            def inner_func(*args, **kwargs):
-                return func(*args, **kwargs)
+    def register(name: str, vectorized: bool = False):
+        """
+        Register a metric. A vectorized metric is given stacked arrays instead of dicts,
+        the returned function still accepts both.
+        """
+
+        def outer_func(func: MetricFunction | VectorizedMetricFunction):
+            def inner_func(consumers, providers, epochs, *args, **kwargs):
+                if vectorized:
+                    consumers = stack(consumers, epochs)
+                    providers = stack(providers, epochs)
+                return func(consumers, providers, epochs, *args, **kwargs)
 
             instance = MetricSystem()
             instance._metric_methods[name] = inner_func
+            if vectorized:
+                instance._vectorized.add(name)
             return inner_func
 
         return outer_func
 
-    def measure(self, *args):
+    def measure(self, consumers, providers, epochs: int):
+        stacked = None
         for metrics in self._metric_methods:
-            print(f"{metrics}: {self._metric_methods[metrics](*args)}")
+            if metrics in self._vectorized:
+                # stack once for all vectorized metrics
+                if stacked is None:
+                    stacked = (stack(consumers, epochs), stack(providers, epochs))
+                result = self._metric_methods[metrics](*stacked, epochs)
+            else:
+                result = self._metric_methods[metrics](consumers, providers, epochs)
+            print(f"{metrics}: {result}")
 
     @staticmethod
     def average(agents: dict[Agent, list[float]]):
@@ -0,0 +1,10 @@
+from .result_set import (
+    RESULT_KINDS,
+    RunResult,
+    result_frame,
+    run_result_of,
+    write_result_set,
+)
+from .sink import FORMATS, ResultSink, result_path
+from .store import ResultStore
+from .aggregate import ResultSummary, RunningStatistics
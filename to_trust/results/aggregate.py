@@ -0,0 +1,135 @@
+import os
+from random import getrandbits
+
+import numpy as np
+import pandas as pd
+
+from .result_set import RESULT_KINDS, RunResult
+
+
+class RunningStatistics:
+    """
+    Per epoch count, mean and variance of a series of samples (one value per epoch),
+    updated one sample at a time with Welford's algorithm. With a `reservoir_size` it also
+    keeps a uniform sample of at most that many series to estimate quantiles from.
+    """
+
+    def __init__(self, epochs: int, reservoir_size: int = 0, seed: int | None = None) -> None:
+        self.count = 0
+        self.mean = np.zeros(epochs)
+        self._m2 = np.zeros(epochs)
+        self.reservoir = np.empty((reservoir_size, epochs))
+        self.seed = seed
+        self._rng = None
+
+    @property
+    def rng(self) -> np.random.Generator:
+        # created on the first replacement, without a reservoir `random` is left untouched
+        if self._rng is None:
+            # fall back on the `random` module so `random.seed` keeps runs reproducible
+            self._rng = np.random.default_rng(
+                self.seed if self.seed is not None else getrandbits(64)
+            )
+        return self._rng
+
+    def add(self, sample: np.ndarray):
+        self.count += 1
+        delta = sample - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (sample - self.mean)
+
+        # reservoir sampling (algorithm R)
+        size = self.reservoir.shape[0]
+        if self.count <= size:
+            self.reservoir[self.count - 1] = sample
+        elif size:
+            i = self.rng.integers(self.count)
+            if i < size:
+                self.reservoir[i] = sample
+
+    def merge(self, other: "RunningStatistics"):
+        """
+        Fold in the samples of `other` (Chan et al.), the reservoir becomes a uniform sample
+        of the samples of both
+        """
+        count = self.count + other.count
+        if other.count == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self._m2 = self._m2 + other._m2 + delta**2 * (self.count * other.count / count)
+
+        size = self.reservoir.shape[0]
+        mine = self.reservoir[: min(self.count, size)]
+        theirs = other.reservoir[: min(other.count, size)]
+        if size and count > size:
+            # how many of the sampled series come from this side, then which ones
+            taken = self.rng.hypergeometric(self.count, other.count, size)
+            mine = mine[self.rng.choice(len(mine), taken, replace=False)]
+            theirs = theirs[self.rng.choice(len(theirs), size - taken, replace=False)]
+        self.reservoir[: len(mine) + len(theirs)] = np.concatenate([mine, theirs])
+        self.count = count
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance per epoch, NaN while there are fewer than two samples"""
+        if self.count < 2:
+            return np.full(self.mean.shape, np.nan)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def quantiles(self, q: list[float]) -> np.ndarray:
+        """(len(q) x epochs) quantiles estimated from the reservoir"""
+        filled = self.reservoir[: min(self.count, self.reservoir.shape[0])]
+        if filled.shape[0] == 0:
+            return np.full((len(q), self.mean.size), np.nan)
+        return np.quantile(filled, q, axis=0)
+
+
+class ResultSummary:
+    """
+    `RunningStatistics` of every result kind across the runs of a cell, the sample of a run
+    being the mean over its agents per epoch, as used by `visualize_results`.
+    """
+
+    def __init__(
+        self,
+        epochs: int,
+        reservoir_size: int = 0,
+        quantiles: tuple[float, ...] = (0.05, 0.5, 0.95),
+    ) -> None:
+        self.epochs = epochs
+        self.quantiles = list(quantiles) if reservoir_size else []
+        self.statistics = {kind: RunningStatistics(epochs, reservoir_size) for kind in RESULT_KINDS}
+
+    def add(self, result: RunResult):
+        for kind, statistics in self.statistics.items():
+            statistics.add(getattr(result, kind).mean(axis=0))
+
+    def merge(self, other: "ResultSummary"):
+        """Fold in the runs `other` summarized"""
+        for kind, statistics in self.statistics.items():
+            statistics.merge(other.statistics[kind])
+
+    def frame(self) -> pd.DataFrame:
+        """One row per result kind per epoch"""
+        frames = []
+        for kind, statistics in self.statistics.items():
+            columns = {
+                "kind": kind,
+                "simulation_run_index": np.arange(self.epochs),
+                "count": statistics.count,
+                "mean": statistics.mean,
+                "variance": statistics.variance,
+            }
+            for q, values in zip(self.quantiles, statistics.quantiles(self.quantiles)):
+                columns[f"q{q:g}"] = values
+            frames.append(pd.DataFrame(columns))
+        return pd.concat(frames, ignore_index=True)
+
+    def write(self, name: str, directory: str = "."):
+        """Write `<name>_summary.csv`"""
+        self.frame().to_csv(os.path.join(directory, f"{name}_summary.csv"), index=False)
@@ -0,0 +1,66 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from to_trust.agents import Consumer, Provider
+
+from .sink import ResultSink, result_path
+
+RESULT_KINDS = {
+    "consumer_utility": ("consumer_index", "utility"),
+    "provider_utility": ("provider_index", "utility"),
+    "consumer_mae": ("consumer_index", "mae"),
+}
+"""result kind -> (agent column, value column) of the exported data"""
+
+
+class RunResult(NamedTuple):
+    """The data of one simulation run, stored as (agents x epochs) arrays"""
+
+    consumer_utility: np.ndarray
+    provider_utility: np.ndarray
+    consumer_mae: np.ndarray
+
+
+def run_result_of(
+    scores: dict[Consumer, list[float]],
+    true_values: dict[Provider, list[float]],
+    epochs: int,
+) -> RunResult:
+    # consumers are reused between the runs of a scenario and keep appending one
+    # MAE value per epoch, so only the last `epochs` values belong to this run
+    return RunResult(
+        np.array([scores[c] for c in scores], dtype=float).reshape(len(scores), -1),
+        np.array([true_values[p] for p in true_values], dtype=float).reshape(len(true_values), -1),
+        np.array([c.MAE[-epochs:] for c in scores], dtype=float).reshape(len(scores), -1),
+    )
+
+
+def result_frame(
+    values: np.ndarray, overall_run_index: int, agent_column: str, value_column: str
+) -> pd.DataFrame:
+    """The long format of the exported csv files: one row per agent per epoch"""
+    agents, epochs = values.shape
+    return pd.DataFrame(
+        {
+            "overall_run_index": overall_run_index,
+            "simulation_run_index": np.tile(np.arange(epochs), agents),
+            agent_column: np.repeat(np.arange(agents), epochs),
+            value_column: values.ravel(),
+        }
+    )
+
+
+def write_result_set(
+    name: str,
+    results: list[RunResult],
+    directory: str = ".",
+    export_format: str = "csv",
+):
+    """Write `<name>_<kind>_data.<csv|parquet>` for every result kind"""
+    for kind, (agent_column, value_column) in RESULT_KINDS.items():
+        path = result_path(name, kind, directory, export_format)
+        with ResultSink(path, agent_column, value_column, export_format=export_format) as sink:
+            for i, result in enumerate(results):
+                sink.append(getattr(result, kind), i)
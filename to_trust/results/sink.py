@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet export is optional
+    pa = None
+    pq = None
+
+FORMATS = {"csv": "csv", "parquet": "parquet"}
+"""export format -> file extension"""
+
+
+class ResultSink:
+    """
+    Writes the long format of one result kind (one row per agent per epoch) block by block.
+
+    Every appended (agents x epochs) block is written into preallocated column buffers,
+    which are flushed to the file whenever `chunk_rows` rows are filled, so memory stays
+    bounded by the chunk size instead of growing with the number of runs.
+    The csv files keep the schema of `result_frame(...).to_csv()`, including the unnamed
+    running index; parquet files (needs `pyarrow`) have the same columns without that index.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        agent_column: str,
+        value_column: str,
+        *,
+        export_format: str = "csv",
+        chunk_rows: int = 1 << 20,
+    ) -> None:
+        if export_format not in FORMATS:
+            raise ValueError(f"Unknown export format {export_format!r}, use one of {list(FORMATS)}")
+        if export_format == "parquet" and pa is None:
+            raise ImportError("Exporting parquet files requires pyarrow")
+
+        self.path = path
+        self.agent_column = agent_column
+        self.value_column = value_column
+        self.export_format = export_format
+        self.chunk_rows = chunk_rows
+
+        self._columns = {
+            "overall_run_index": np.empty(chunk_rows, dtype=np.int64),
+            "simulation_run_index": np.empty(chunk_rows, dtype=np.int64),
+            agent_column: np.empty(chunk_rows, dtype=np.int64),
+            value_column: np.empty(chunk_rows, dtype=float),
+        }
+        self._size = 0
+        self._written = 0
+        self._writer = None
+
+    def append(self, values: np.ndarray, overall_run_index: int):
+        """Add the (agents x epochs) `values` of one run"""
+        agents, epochs = values.shape
+        flat = values.ravel()
+        start = 0
+        while start < flat.size:
+            n = min(self.chunk_rows - self._size, flat.size - start)
+            rows = slice(self._size, self._size + n)
+            positions = np.arange(start, start + n)
+            self._columns["overall_run_index"][rows] = overall_run_index
+            self._columns["simulation_run_index"][rows] = positions % epochs
+            self._columns[self.agent_column][rows] = positions // epochs
+            self._columns[self.value_column][rows] = flat[start : start + n]
+            self._size += n
+            start += n
+            if self._size == self.chunk_rows:
+                self.flush()
+
+    def flush(self):
+        if self._size == 0 and self._written > 0:
+            return
+        columns = {name: buffer[: self._size] for name, buffer in self._columns.items()}
+        if self.export_format == "csv":
+            frame = pd.DataFrame(
+                columns, index=pd.RangeIndex(self._written, self._written + self._size)
+            )
+            frame.to_csv(self.path, mode="w" if self._written == 0 else "a", header=self._written == 0)
+        else:
+            table = pa.table(columns)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        self._written += self._size
+        self._size = 0
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def result_path(name: str, kind: str, directory: str = ".", export_format: str = "csv") -> str:
+    return os.path.join(directory, f"{name}_{kind}_data.{FORMATS[export_format]}")
@@ -0,0 +1,108 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .result_set import RESULT_KINDS, RunResult
+
+
+class ResultStore:
+    """
+    Directory of `.npy` files, one (runs x agents x epochs) array per method x scenario x
+    result kind, indexed by `catalogue.json`. Arrays are loaded memory-mapped, so a query
+    only reads the data it touches and never parses text.
+    """
+
+    CATALOGUE = "catalogue.json"
+
+    def __init__(self, directory: str = "result_store") -> None:
+        self.directory = directory
+        self.catalogue: dict[str, dict[str, object]] = self._load_catalogue()
+
+    @staticmethod
+    def key(method: str, scenario: str, kind: str) -> str:
+        return f"{method}_{scenario}_{kind}"
+
+    def write(self, method: str, scenario: str, results: list[RunResult]):
+        """Store the runs of one method x scenario cell, replacing earlier ones"""
+        for kind in RESULT_KINDS:
+            self.add(method, scenario, kind, np.stack([getattr(r, kind) for r in results]))
+        self._save_catalogue()
+
+    def add(self, method: str, scenario: str, kind: str, values: np.ndarray):
+        os.makedirs(self.directory, exist_ok=True)
+        key = self.key(method, scenario, kind)
+        file_name = f"{key}.npy"
+        temporary = os.path.join(self.directory, f".{file_name}.{os.getpid()}.tmp")
+        with open(temporary, "wb") as f:
+            np.save(f, np.asarray(values, dtype=float))
+        os.replace(temporary, os.path.join(self.directory, file_name))
+        self.catalogue[key] = {
+            "method": method,
+            "scenario": scenario,
+            "kind": kind,
+            "file": file_name,
+            "shape": list(values.shape),
+        }
+
+    def import_csv(self, path: str, method: str, scenario: str, kind: str):
+        """Add a result set exported by `write_result_set` as csv"""
+        agent_column, value_column = RESULT_KINDS[kind]
+        frame = pd.read_csv(
+            path,
+            usecols=["overall_run_index", "simulation_run_index", agent_column, value_column],
+        )
+        # older exports repeat the same run index for every run, so repeated
+        # (run, agent, epoch) rows are told apart by their order of occurrence
+        repeat = frame.groupby(
+            ["overall_run_index", agent_column, "simulation_run_index"]
+        ).cumcount()
+        _, run = np.unique(
+            frame["overall_run_index"].to_numpy() * (repeat.max() + 1) + repeat.to_numpy(),
+            return_inverse=True,
+        )
+        agent = frame[agent_column].to_numpy()
+        epoch = frame["simulation_run_index"].to_numpy()
+        values = np.full((run.max() + 1, agent.max() + 1, epoch.max() + 1), np.nan)
+        values[run, agent, epoch] = frame[value_column].to_numpy()
+        self.add(method, scenario, kind, values)
+        self._save_catalogue()
+
+    def entries(
+        self, method: str | None = None, scenario: str | None = None, kind: str | None = None
+    ) -> list[dict[str, object]]:
+        return [
+            entry
+            for entry in self.catalogue.values()
+            if (method is None or entry["method"] == method)
+            and (scenario is None or entry["scenario"] == scenario)
+            and (kind is None or entry["kind"] == kind)
+        ]
+
+    def methods(self, scenario: str | None = None) -> list[str]:
+        return list(dict.fromkeys(e["method"] for e in self.entries(scenario=scenario)))
+
+    def scenarios(self) -> list[str]:
+        return list(dict.fromkeys(e["scenario"] for e in self.entries()))
+
+    def load(self, method: str, scenario: str, kind: str) -> np.ndarray:
+        """The (runs x agents x epochs) array of one result kind, memory-mapped read only"""
+        entry = self.catalogue[self.key(method, scenario, kind)]
+        return np.load(os.path.join(self.directory, entry["file"]), mmap_mode="r")
+
+    def epoch_mean(self, method: str, scenario: str, kind: str) -> np.ndarray:
+        """Mean over every run and agent per epoch, skipping the NaN padding of shorter runs"""
+        return np.nanmean(self.load(method, scenario, kind), axis=(0, 1))
+
+    def _load_catalogue(self) -> dict[str, dict[str, object]]:
+        path = os.path.join(self.directory, self.CATALOGUE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_catalogue(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, self.CATALOGUE), "w") as f:
+            json.dump(self.catalogue, f, indent=4, sort_keys=True)
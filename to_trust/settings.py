@@ -1,4 +1,4 @@
-from to_trust import LyingMode
+from to_trust import LyingMode, TestimonyMode
 from to_trust.methods import ITEA, MET, Act, Travos
 from to_trust.scenarios import (
     FireProvider,
@@ -11,9 +11,29 @@ from to_trust.scenarios import (
 )
 from to_trust.scenarios.stop_lying import StopLying
 
-epochs = 1
-runs = 50
-ntcm_type = ITEA
+epochs = 50
+runs = 1
+# methods compared against each other on every scenario
+methods = [ITEA]
+# number of worker processes of the sweep, None uses every core
+workers = 1
+# runs per job of the sweep, the runs of one cell are spread over the workers in these chunks
+chunk_size = 1
+# replay the same provider outcomes for run i of every method (paired comparisons)
+common_random_numbers = False
+# PerEpoch: every witness testifies once per provider per epoch, shared by all consumers
+testimony_mode = TestimonyMode.PerCall
+# format of the exported result sets, "csv", "parquet" (needs pyarrow) or None
+export_format = "csv"
+# directory of the result store read by visualize_results, None to skip it
+result_store = "result_store"
+# only export the per epoch mean/variance across runs instead of every agent of every run
+summary_only = False
+# number of runs kept to estimate quantiles in the summary, 0 for none
+reservoir_size = 0
+
+# write the profiled call tree as "chrome" trace events or a "speedscope" profile, None for neither
+profile_trace = None
 
 # Plotting settings
 plot_run = True
@@ -33,7 +53,7 @@ general_parameters = {
     #     "starts_lying": None,
     #     "epochs_before_dishonest": None,
     # },
-    "consumer_amount": 1 if ntcm_type is Travos else 5,
+    "consumer_amount": 5,
     "provider_amount": 50,
     "provider_options": {
         "chance": None,
@@ -166,6 +186,17 @@ bs_bm_hostile_80 = HostileEnvironment(
     **general_parameters, **bs_bm_hostile_80_parameters
 )
 
+# scenario attributes overridden for every cell of a method
+method_overrides = {
+    Travos: {"consumer_amount": 1},
+}
+
+# labelled scenario attribute overrides, every label is run as a separate cell
+overrides = {
+    "": {},
+    # "T10": {"consumer_options": {"T": 10}},
+}
+
 scenarios = {
     # "stop_lying": become_honest,
     # "start_lying": become_dishonest,
@@ -0,0 +1,301 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from random import getrandbits
+from random import seed as seed_random
+from time import perf_counter
+from typing import NamedTuple
+
+from to_trust.agents import Consumer
+from to_trust.methods import name_of
+from to_trust.results import (
+    ResultStore,
+    ResultSummary,
+    RunResult,
+    run_result_of,
+    write_result_set,
+)
+from to_trust.testbed import Scenario, Simulation, outcome_matrix
+from to_trust.testbed.simulation import derive_seeds
+from to_trust.util import profiler
+
+
+class Cell:
+    """One method x scenario x parameter override combination of a sweep"""
+
+    ntcm: type[Consumer]
+    scenario_name: str
+    scenario: Scenario
+    label: str
+    overrides: dict[str, object]
+
+    def __init__(
+        self,
+        ntcm: type[Consumer],
+        scenario_name: str,
+        scenario: Scenario,
+        label: str = "",
+        overrides: dict[str, object] | None = None,
+    ) -> None:
+        self.ntcm = ntcm
+        self.scenario_name = scenario_name
+        self.scenario = scenario
+        self.label = label
+        self.overrides = overrides or {}
+
+    @property
+    def method_name(self) -> str:
+        if self.label:
+            return f"{name_of(self.ntcm)}-{self.label}"
+        return name_of(self.ntcm)
+
+    @property
+    def name(self) -> str:
+        return f"{self.method_name}_{self.scenario_name}"
+
+    def create_scenario(self) -> Scenario:
+        scenario = deepcopy(self.scenario)
+        for attribute, value in self.overrides.items():
+            setattr(scenario, attribute, value)
+        return scenario
+
+
+class Job(NamedTuple):
+    """A chunk of the runs of a cell, the unit the sweep schedules on its workers"""
+
+    cell: Cell
+    runs: range
+
+
+def _run_chunk(
+    cell: Cell,
+    simulation: type[Simulation],
+    simulation_options: dict[str, object],
+    epochs: int,
+    seeds: list[int],
+    common_random_numbers: bool = False,
+    outcomes_directory: str | None = None,
+    summary_only: bool = False,
+    reservoir_size: int = 0,
+) -> tuple[list[RunResult] | ResultSummary, float]:
+    """
+    The runs of `cell` with the given run seeds. Every run starts from its own copy of the
+    scenario, like the runs of `Simulation.parallel_runs`, so a run only depends on its seed
+    and not on the runs before it in the same chunk.
+    """
+    start = perf_counter()
+    results = []
+    summary = ResultSummary(epochs, reservoir_size) if summary_only else None
+    for run_seed in seeds:
+        scenario = cell.create_scenario()
+        sim = simulation(scenario, cell.ntcm, epochs, **simulation_options)
+        seed_random(run_seed)
+        outcomes = None
+        if common_random_numbers:
+            providers = len(scenario.get_providers())
+            outcomes = outcome_matrix(run_seed, epochs, providers, outcomes_directory)
+        result = run_result_of(*sim.run(outcomes=outcomes), epochs)
+        if summary is not None:
+            # only the running statistics are kept, the raw run is dropped right away
+            summary.add(result)
+        else:
+            results.append(result)
+    if summary is not None:
+        return summary, perf_counter() - start
+    return results, perf_counter() - start
+
+
+class Sweep:
+    """
+    Runs the cross product of methods, scenarios and labelled parameter overrides on a pool
+    of worker processes and writes one result set per cell.
+
+    Overrides are set as attributes on a copy of the scenario, e.g.
+    `{"small": {"consumer_amount": 1}}`; `method_overrides` does the same for every cell
+    of one method, and `simulation_options` are passed on to the simulation engine
+    (e.g. `testimony_mode`). The runs of every cell are split into jobs of `chunk_size` runs,
+    so a few cells with many runs still keep every worker busy. Jobs are submitted
+    longest-job-first using the timings of earlier sweeps stored in `timings_file`, so the
+    chunks of slow cells don't end up as the tail of the sweep.
+    Run i of a cell gets the i-th seed derived from `seed` and its own copy of the scenario,
+    so it gives the same result as run i of `Simulation.parallel_runs` with that seed.
+
+    With `common_random_numbers` run i of every cell replays the same provider outcomes
+    (see `outcome_matrix`), cached in `outcomes_directory`, so methods are compared paired.
+    Result sets are written to `output_directory` as `export_format` ("csv" or "parquet",
+    None to skip them) and, with a `store_directory`, to the `ResultStore` in that directory.
+    With `summary_only` the runs are folded into a `ResultSummary` (per epoch mean and
+    variance across runs, quantiles from a reservoir of `reservoir_size` runs) as they are
+    produced and only `<cell>_summary.csv` is written.
+    """
+
+    def __init__(
+        self,
+        methods: list[type[Consumer]],
+        scenarios: dict[str, Scenario],
+        overrides: dict[str, dict[str, object]] | None = None,
+        *,
+        method_overrides: dict[type[Consumer], dict[str, object]] | None = None,
+        epochs: int = 100,
+        runs: int = 1,
+        workers: int | None = None,
+        chunk_size: int = 1,
+        simulation: type[Simulation] = Simulation,
+        simulation_options: dict[str, object] | None = None,
+        seed: int | None = None,
+        common_random_numbers: bool = False,
+        outcomes_directory: str | None = "outcomes",
+        output_directory: str = ".",
+        export_format: str | None = "csv",
+        store_directory: str | None = None,
+        summary_only: bool = False,
+        reservoir_size: int = 0,
+        timings_file: str | None = "sweep_timings.json",
+    ) -> None:
+        self.methods = methods
+        self.scenarios = scenarios
+        self.overrides = overrides or {"": {}}
+        self.method_overrides = method_overrides or {}
+        self.epochs = epochs
+        self.runs = runs
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.simulation = simulation
+        self.simulation_options = simulation_options or {}
+        # one base seed for every cell, so run i gets the same seed in every cell
+        self.seed = seed if seed is not None else getrandbits(64)
+        self.common_random_numbers = common_random_numbers
+        self.outcomes_directory = outcomes_directory
+        self.output_directory = output_directory
+        self.export_format = export_format
+        self.store = ResultStore(store_directory) if store_directory is not None else None
+        self.summary_only = summary_only
+        self.reservoir_size = reservoir_size
+        self.timings_file = timings_file
+        self.timings = self._load_timings()
+
+    def cells(self) -> list[Cell]:
+        return [
+            Cell(
+                ntcm,
+                scenario_name,
+                scenario,
+                label,
+                {**self.method_overrides.get(ntcm, {}), **overrides},
+            )
+            for ntcm in self.methods
+            for scenario_name, scenario in self.scenarios.items()
+            for label, overrides in self.overrides.items()
+        ]
+
+    def estimate(self, cell: Cell) -> float:
+        """Expected duration of `cell`; cells that never ran are assumed to be the longest"""
+        if cell.name in self.timings:
+            return self.timings[cell.name]
+        method = name_of(cell.ntcm)
+        same_method = [
+            t
+            for name, t in self.timings.items()
+            if name.startswith(f"{method}_") or name.startswith(f"{method}-")
+        ]
+        if same_method:
+            return sum(same_method) / len(same_method)
+        return float("inf")
+
+    def jobs(self) -> list[Job]:
+        return [
+            Job(cell, range(start, min(start + self.chunk_size, self.runs)))
+            for cell in self.cells()
+            for start in range(0, self.runs, self.chunk_size)
+        ]
+
+    def schedule(self) -> list[Job]:
+        # the timings are of whole cells, a chunk takes its share of them
+        return sorted(
+            self.jobs(),
+            key=lambda job: self.estimate(job.cell) * len(job.runs) / self.runs,
+            reverse=True,
+        )
+
+    def run(self, printing=False):
+        """
+        Run every cell, yielding `(cell, results)` as soon as all runs of a cell are
+        finished, or `(cell, summary)` with `summary_only`. Results are in run order and
+        chunk summaries are merged in run order, whatever order the jobs finish in.
+        """
+        jobs = self.schedule()
+        seeds = derive_seeds(self.seed, self.runs)
+
+        def arguments(job: Job) -> tuple:
+            return (
+                job.cell,
+                self.simulation,
+                self.simulation_options,
+                self.epochs,
+                seeds[job.runs.start : job.runs.stop],
+                self.common_random_numbers,
+                self.outcomes_directory,
+                self.summary_only,
+                self.reservoir_size,
+            )
+
+        if self.workers == 1:
+            finished = ((job, _run_chunk(*arguments(job))) for job in jobs)
+            yield from self._finish(self._collect(jobs, finished), printing)
+            return
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            run_chunk = profiler.remote(_run_chunk)
+            futures = {pool.submit(run_chunk, *arguments(job)): job for job in jobs}
+            finished = (
+                (futures[f], profiler.merge_result(f.result())) for f in as_completed(futures)
+            )
+            yield from self._finish(self._collect(jobs, finished), printing)
+
+    def _collect(self, jobs: list[Job], finished):
+        """Gather the finished chunks per cell, yield every cell once all its chunks are done"""
+        remaining = {}
+        for job in jobs:
+            remaining[job.cell] = remaining.get(job.cell, 0) + 1
+        chunks = {cell: [] for cell in remaining}
+        for job, output in finished:
+            chunks[job.cell].append((job.runs.start, output))
+            remaining[job.cell] -= 1
+            if remaining[job.cell]:
+                continue
+            outputs = [o for _start, o in sorted(chunks.pop(job.cell), key=lambda c: c[0])]
+            elapsed = sum(chunk_elapsed for _results, chunk_elapsed in outputs)
+            if self.summary_only:
+                results = outputs[0][0]
+                for summary, _elapsed in outputs[1:]:
+                    results.merge(summary)
+            else:
+                results = [result for chunk, _elapsed in outputs for result in chunk]
+            yield job.cell, (results, elapsed)
+
+    def _finish(self, finished, printing):
+        for cell, (results, elapsed) in finished:
+            if printing:
+                print(f"[Sweep] - {cell.name} finished in {elapsed:.2f}s")
+            if self.summary_only:
+                results.write(cell.name, self.output_directory)
+            elif self.export_format is not None:
+                write_result_set(cell.name, results, self.output_directory, self.export_format)
+            if self.store is not None and not self.summary_only:
+                self.store.write(cell.method_name, cell.scenario_name, results)
+            self.timings[cell.name] = elapsed
+            self._save_timings()
+            yield cell, results
+
+    def _load_timings(self) -> dict[str, float]:
+        if self.timings_file is None or not os.path.exists(self.timings_file):
+            return {}
+        with open(self.timings_file) as f:
+            return json.load(f)
+
+    def _save_timings(self):
+        if self.timings_file is None:
+            return
+        with open(self.timings_file, "w") as f:
+            json.dump(self.timings, f, indent=4, sort_keys=True)
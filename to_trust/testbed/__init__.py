@@ -1,2 +1,4 @@
 from .scenario import Scenario
 from .simulation import Simulation
+from .array_simulation import ArraySimulation
+from .common_random import honesty_draws, outcome_matrix
@@ -0,0 +1,106 @@
+from random import getrandbits
+
+import numpy as np
+
+from to_trust.agents import Consumer, Provider, TestimonyMode
+from to_trust.util import profiler
+
+from .scenario import Scenario
+from .simulation import Simulation
+
+
+def has_own_service(provider: Provider) -> bool:
+    """Whether `provider` serves in its own way instead of through chance, quality and cost"""
+    return type(provider).get_service is not Provider.get_service
+
+
+class ArraySimulation(Simulation):
+    """
+    Simulation engine that keeps the provider parameters, the true values per epoch
+    and the consumer scores in preallocated NumPy arrays. All provider outcomes of an
+    epoch are drawn with one vectorized call instead of a `get_service` call per provider.
+    Providers that override `get_service` keep being asked through it, with their
+    entry of the epoch's draws.
+
+    `run` returns the same `(scores, true_values)` mapping as `Simulation.run`, where
+    every value is a row view into `score_matrix` (C x T) or `true_value_matrix` (P x T).
+    A common `outcome_matrix` and honesty draws can be replayed through `outcomes` and
+    `honesty_draws` like with `Simulation.run`.
+    """
+
+    chance: np.ndarray
+    quality: np.ndarray
+    cost: np.ndarray
+    true_value_matrix: np.ndarray
+    score_matrix: np.ndarray
+    seed: int | None
+
+    def __init__(
+        self,
+        scenario: Scenario,
+        ntcm: type[Consumer],
+        total_epochs: int = 100,
+        *,
+        testimony_mode: TestimonyMode = TestimonyMode.PerCall,
+        vectorized_testimonies: bool = True,
+        seed: int | None = None,
+    ):
+        super().__init__(
+            scenario,
+            ntcm,
+            total_epochs,
+            testimony_mode=testimony_mode,
+            vectorized_testimonies=vectorized_testimonies,
+        )
+        self.seed = seed
+
+    @profiler.profile
+    def run(
+        self,
+        printing=False,
+        outcomes: np.ndarray | None = None,
+        honesty_draws: np.ndarray | None = None,
+    ) -> tuple[dict[Consumer, np.ndarray], dict[Provider, np.ndarray]]:
+        self.clean()
+        self.setup()
+        self.ntcm.preprocess(self.witnesses, self.providers)
+        if outcomes is None:
+            # fall back on the `random` module so `random.seed` keeps runs reproducible
+            rng = np.random.default_rng(
+                self.seed if self.seed is not None else getrandbits(64)
+            )
+
+        self.chance = np.array([p.chance for p in self.providers], dtype=float)
+        self.quality = np.array([p.quality for p in self.providers], dtype=float)
+        self.cost = np.array([p.cost for p in self.providers], dtype=float)
+        gain = self.quality - self.cost
+        loss = -self.cost
+
+        self.true_value_matrix = np.empty((len(self.providers), self.total_epochs))
+        self.score_matrix = np.empty((len(self.consumers), self.total_epochs))
+        provider_ids = self.registry.providers.ids
+        custom = [(i, p) for i, p in enumerate(self.providers) if has_own_service(p)]
+
+        for _step in range(self.total_epochs):
+            profiler.start("Simulation: epoch")
+            if printing:
+                print(f"[Epoch: {_step:2}]")
+            self._start_epoch(None if honesty_draws is None else honesty_draws[_step])
+            draws = rng.random(len(self.providers)) if outcomes is None else outcomes[_step]
+            values = np.where(draws < self.chance, gain, loss)
+            for i, p in custom:
+                values[i] = p.get_service(float(draws[i]))
+            self.true_value_matrix[:, _step] = values
+            last_value = values.tolist()
+            for i, consumer in enumerate(self.consumers):
+                chosen_provider = consumer.choose_provider()
+                score = last_value[provider_ids[chosen_provider]]
+                self.score_matrix[i, _step] = score
+                consumer.update_provider(chosen_provider, score)
+            self._end_epoch()
+            profiler.stop("Simulation: epoch")
+
+        scores = {c: self.score_matrix[i] for i, c in enumerate(self.consumers)}
+        true_values = {p: self.true_value_matrix[i] for i, p in enumerate(self.providers)}
+        self.runs_data.append((scores, true_values))
+        return self.last_run
@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+ROWS_PER_CHUNK = 4096
+
+
+def outcome_matrix(
+    seed: int, epochs: int, providers: int, cache_directory: str | None = None
+) -> np.ndarray:
+    """
+    The (epochs x providers) uniform draws that decide every provider outcome of one run:
+    provider `p` delivers its quality at epoch `t` when `p.chance > matrix[t, p]`.
+
+    The matrix only depends on the seed and its shape, so replaying it into the simulation
+    of every method gives paired comparisons on common random numbers. With a
+    `cache_directory` the matrix is generated once, stored as `.npy` and memory-mapped.
+    """
+    if cache_directory is None:
+        return np.random.default_rng(seed).random((epochs, providers))
+
+    path = os.path.join(cache_directory, f"outcomes_{seed}_{epochs}x{providers}.npy")
+    if not os.path.exists(path):
+        os.makedirs(cache_directory, exist_ok=True)
+        # written under a temporary name, workers can race to create the same matrix
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        matrix = open_memmap(tmp_path, mode="w+", dtype=np.float64, shape=(epochs, providers))
+        rng = np.random.default_rng(seed)
+        for start in range(0, epochs, ROWS_PER_CHUNK):
+            stop = min(start + ROWS_PER_CHUNK, epochs)
+            matrix[start:stop] = rng.random((stop - start, providers))
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+def honesty_draws(seed: int, epochs: int, witnesses: int, providers: int) -> np.ndarray:
+    """
+    The (epochs x witnesses x providers) uniform draws that decide whether a witness is
+    honest about a provider at an epoch, for `Simulation.run(honesty_draws=...)`.
+    Drawn from a stream independent of the `outcome_matrix` of the same seed.
+    """
+    return np.random.default_rng([seed, 1]).random((epochs, witnesses, providers))
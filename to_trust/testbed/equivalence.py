@@ -0,0 +1,128 @@
+import random
+from copy import deepcopy
+from typing import NamedTuple
+
+import numpy as np
+
+from to_trust.agents import Consumer, TestimonyMode
+from to_trust.results import RESULT_KINDS, RunResult, run_result_of
+
+from .array_simulation import ArraySimulation
+from .common_random import honesty_draws, outcome_matrix
+from .scenario import Scenario
+from .simulation import Simulation, derive_seeds
+
+
+class Equivalence(NamedTuple):
+    """The runs of a reference and a candidate engine on the same randomness"""
+
+    reference: list[RunResult]
+    candidate: list[RunResult]
+
+    def max_difference(self, kind: str) -> float:
+        """Largest absolute difference of any agent at any epoch of any run"""
+        return max(
+            float(np.max(np.abs(getattr(r, kind) - getattr(c, kind)), initial=0))
+            for r, c in zip(self.reference, self.candidate)
+        )
+
+    def z_score(self, kind: str) -> float:
+        """
+        Difference of the mean over runs of the total (mean over agents, summed over epochs)
+        of both engines, in standard errors of that difference
+        """
+        reference = np.array([getattr(r, kind).mean(axis=0).sum() for r in self.reference])
+        candidate = np.array([getattr(c, kind).mean(axis=0).sum() for c in self.candidate])
+        difference = candidate.mean() - reference.mean()
+        if len(reference) < 2:
+            return 0.0 if difference == 0 else float("inf")
+        error = np.sqrt(
+            reference.var(ddof=1) / len(reference) + candidate.var(ddof=1) / len(candidate)
+        )
+        if error == 0:
+            return 0.0 if difference == 0 else float("inf")
+        return float(abs(difference) / error)
+
+
+def compare_engines(
+    scenario: Scenario,
+    reference_ntcm: type[Consumer],
+    candidate_ntcm: type[Consumer] | None = None,
+    epochs: int = 100,
+    runs: int = 5,
+    *,
+    reference: type[Simulation] = Simulation,
+    reference_options: dict[str, object] | None = None,
+    candidate: type[Simulation] = ArraySimulation,
+    candidate_options: dict[str, object] | None = None,
+    seed: int | None = None,
+) -> Equivalence:
+    """
+    Run `reference_ntcm` with a reference engine and `candidate_ntcm` (the same method when
+    None) with a candidate engine on copies of `scenario`, every run of both replaying the
+    same `outcome_matrix` and `random` seed.
+
+    By default the reference is the `Simulation` engine and the candidate the
+    `ArraySimulation` engine, both in their default testimony mode, where they share the
+    testimony draws through the `random` seed; options are passed on to the engines on top
+    of that. A candidate in `TestimonyMode.PerEpoch` draws the honesty of the witnesses
+    once per epoch, those draws are only shared with a reference in that mode: the
+    reference then also runs per epoch, asking every witness through `Witness.score_of`,
+    and both replay the same `honesty_draws`.
+    """
+    candidate_ntcm = candidate_ntcm or reference_ntcm
+    candidate_options = candidate_options or {}
+    per_epoch = candidate_options.get("testimony_mode") is TestimonyMode.PerEpoch
+    reference_defaults = (
+        {"testimony_mode": TestimonyMode.PerEpoch, "vectorized_testimonies": False}
+        if per_epoch
+        else {}
+    )
+    reference_options = {**reference_defaults, **(reference_options or {})}
+    share_draws = per_epoch and reference_options.get("testimony_mode") is TestimonyMode.PerEpoch
+    engines = [
+        reference(deepcopy(scenario), reference_ntcm, epochs, **reference_options),
+        candidate(deepcopy(scenario), candidate_ntcm, epochs, **candidate_options),
+    ]
+    witnesses, providers = _agent_amounts(scenario, reference_ntcm)
+
+    results: list[list[RunResult]] = [[], []]
+    for run_seed in derive_seeds(seed, runs):
+        outcomes = outcome_matrix(run_seed, epochs, providers)
+        draws = honesty_draws(run_seed, epochs, witnesses, providers) if share_draws else None
+        for engine, engine_results in zip(engines, results):
+            random.seed(run_seed)
+            run = engine.run(outcomes=outcomes, honesty_draws=draws)
+            engine_results.append(run_result_of(*run, epochs))
+    return Equivalence(*results)
+
+
+def assert_equivalent(
+    equivalence: Equivalence, atol: float = 1e-9, kinds: list[str] | None = None
+):
+    """Raise an `AssertionError` if any value of the engines differs by more than `atol`"""
+    differences = {kind: equivalence.max_difference(kind) for kind in kinds or RESULT_KINDS}
+    failed = {kind: d for kind, d in differences.items() if not d <= atol}
+    if failed:
+        raise AssertionError(f"Engines differ by more than {atol}: {failed}")
+
+
+def assert_statistically_equivalent(
+    equivalence: Equivalence, z: float = 3.0, kinds: list[str] | None = None
+):
+    """Raise an `AssertionError` if the mean totals of the engines differ by more than `z` standard errors"""
+    scores = {kind: equivalence.z_score(kind) for kind in kinds or RESULT_KINDS}
+    failed = {kind: s for kind, s in scores.items() if not s <= z}
+    if failed:
+        raise AssertionError(f"Engines differ by more than {z} standard errors: {failed}")
+
+
+def _agent_amounts(scenario: Scenario, ntcm: type[Consumer]) -> tuple[int, int]:
+    """Amount of witnesses and providers `scenario` creates, without disturbing `random`"""
+    state = random.getstate()
+    try:
+        probe = Simulation(deepcopy(scenario), ntcm)
+        probe.clean()
+        return len(probe.witnesses), len(probe.providers)
+    finally:
+        random.setstate(state)
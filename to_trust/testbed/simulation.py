@@ -1,9 +1,35 @@
-from to_trust.agents import Consumer, Provider, Witness
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import copy
+from random import getrandbits
+from random import seed as seed_random
+
+import numpy as np
+
+from to_trust.agents import (
+    AgentRegistry,
+    Consumer,
+    Provider,
+    TestimonyCache,
+    TestimonyMode,
+    Witness,
+)
 from to_trust.util import ToDoException, profiler
 
 from .scenario import Scenario
 
 
+def derive_seeds(seed: int | None, n: int) -> list[int]:
+    """Derive `n` independent, reproducible seeds from `seed`; the i-th seed does not depend on `n`"""
+    if seed is None:
+        seed = getrandbits(64)
+    return [int(s.generate_state(1, np.uint64)[0]) for s in np.random.SeedSequence(seed).spawn(n)]
+
+
+def _seeded_run(simulation: "Simulation", seed: int):
+    seed_random(seed)
+    return simulation.run()
+
+
 class Simulation:
     witnesses: list[Witness]
     consumers: list[Consumer]
@@ -12,18 +38,27 @@ class Simulation:
     runs_data: list[tuple[dict[Consumer, list[float]], dict[Provider, list[float]]]]
     ntcm: type[Consumer]
     scenario: Scenario
+    testimony_mode: TestimonyMode
+    testimonies: TestimonyCache | None
+    registry: AgentRegistry
 
     def __init__(
         self,
         scenario: Scenario,
         ntcm: type[Consumer],
         total_epochs: int = 100,
+        *,
+        testimony_mode: TestimonyMode = TestimonyMode.PerCall,
+        vectorized_testimonies: bool = True,
     ):
         if scenario is None or ntcm is None:
             raise ToDoException()
         self.ntcm = ntcm
         self.scenario = scenario
         self.total_epochs = total_epochs
+        self.testimony_mode = testimony_mode
+        self.vectorized_testimonies = vectorized_testimonies
+        self.testimonies = None
         self.runs_data = []
 
     @property
@@ -44,10 +79,55 @@ class Simulation:
                 print(f"Simulation run: {i}")
             yield self.run(printing)
 
+    @profiler.profile
+    def parallel_runs(
+        self,
+        n: int = 5,
+        *,
+        max_workers: int | None = None,
+        seed: int | None = None,
+        ordered: bool = True,
+        printing=False,
+    ):
+        """
+        Fan `n` independent runs out over a process pool.
+
+        Every run gets its own seed derived from `seed`, so the i-th run is reproducible
+        regardless of the amount of workers, and its own copy of the scenario as it is now,
+        so unlike with `runs` no run continues with the agents of another. Results are yielded in run order, or in order
+        of completion when `ordered` is False. The profiler timers of the workers are
+        merged into the profiler of this process.
+        """
+        seeds = derive_seeds(seed, n)
+        with ProcessPoolExecutor(max_workers) as pool:
+            futures = {
+                pool.submit(profiler.remote(_seeded_run), self._spawn(), run_seed): i
+                for i, run_seed in enumerate(seeds)
+            }
+            for future in futures if ordered else as_completed(futures):
+                if printing:
+                    print(f"Simulation run: {futures[future]}")
+                self.runs_data.append(profiler.merge_result(future.result()))
+                yield self.last_run
+
+    def _spawn(self) -> "Simulation":
+        """A copy of this simulation without any run data, to ship to a worker process"""
+        simulation = copy(self)
+        simulation.runs_data = []
+        return simulation
+
     @profiler.profile
     def run(
-        self, printing=False
+        self,
+        printing=False,
+        outcomes: np.ndarray | None = None,
+        honesty_draws: np.ndarray | None = None,
     ) -> list[tuple[dict[Consumer, list[float]], dict[Provider, list[float]]]]:
+        """
+        Run one simulation, `outcomes` replays a common `outcome_matrix` and
+        `honesty_draws` common (epochs x witnesses x providers) witness honesty draws when
+        given, the latter needs `TestimonyMode.PerEpoch`
+        """
         self.clean()
         true_values: dict[Provider, list[float]] = {p: [] for p in self.providers}
         last_value = {p: 0.0 for p in self.providers}
@@ -60,28 +140,47 @@ class Simulation:
             profiler.start("Simulation: epoch")
             if printing:
                 print(f"[Epoch: {_step:2}]")
-            for p in self.providers:
-                last_value[p] = p.get_service()
+            self._start_epoch(None if honesty_draws is None else honesty_draws[_step])
+            for i, p in enumerate(self.providers):
+                last_value[p] = p.get_service(
+                    None if outcomes is None else outcomes[_step, i]
+                )
                 true_values[p] += [last_value[p]]
             for consumer in self.consumers:
                 chosen_provider = consumer.choose_provider()
                 score = last_value[chosen_provider]
                 scores[consumer] += [score]
                 consumer.update_provider(chosen_provider, score)
-            for consumer in self.consumers:
-                consumer.update()
-            for witness in self.witnesses:
-                witness.update()
-            self.scenario.update(self.providers, self.consumers, self.witnesses)
+            self._end_epoch()
             profiler.stop("Simulation: epoch")
         self.runs_data.append((scores, true_values))
         return self.last_run
 
+    def _start_epoch(self, honesty_draws: np.ndarray | None = None):
+        if self.testimonies is not None:
+            self.testimonies.refresh(honesty_draws)
+        elif honesty_draws is not None:
+            raise ValueError("Common honesty draws need TestimonyMode.PerEpoch")
+
+    def _end_epoch(self):
+        for consumer in self.consumers:
+            consumer.update()
+        for witness in self.witnesses:
+            witness.update()
+        self.scenario.update(self.providers, self.consumers, self.witnesses)
+
     @profiler.profile
     def setup(self):
+        self.registry = AgentRegistry(self.providers, self.witnesses, self.consumers)
         for c in self.consumers:
+            c.registry = self.registry
             c.register_providers(self.providers)
             c.register_witnesses(self.witnesses)
         for w in self.witnesses:
             w.register_providers(self.providers)
         self.scenario.preprocess()
+        self.testimonies = None
+        if self.testimony_mode == TestimonyMode.PerEpoch:
+            self.testimonies = TestimonyCache(self.registry, self.vectorized_testimonies)
+        for c in self.consumers:
+            c.testimonies = self.testimonies
@@ -1,5 +1,10 @@
-from time import time_ns
-from typing import Any, Callable
+import json
+import os
+from functools import wraps
+from copy import deepcopy
+from random import Random
+from time import perf_counter_ns
+from typing import Any, Callable, NamedTuple
 
 
 class Singleton(type):
@@ -28,59 +33,324 @@ def log(func: Callable[[Any], Any]):
     return new_func
 
 
+class Timer:
+    """Running aggregates of the measured durations of one timer, in ns"""
+
+    def __init__(self, reservoir_size: int = 0) -> None:
+        self.hits = 0
+        self.total = 0
+        self.min: int | None = None
+        self.max: int | None = None
+        self.starts: list[int] = []
+        self.reservoir_size = reservoir_size
+        self.reservoir: list[int] = []
+        # own generator, so sampling durations doesn't disturb the seeded `random` module
+        self._random = Random(0)
+
+    def add(self, duration: int):
+        self.hits += 1
+        self.total += duration
+        if self.min is None or duration < self.min:
+            self.min = duration
+        if self.max is None or duration > self.max:
+            self.max = duration
+
+        # uniform sample of the durations (algorithm R)
+        if len(self.reservoir) < self.reservoir_size:
+            self.reservoir.append(duration)
+        elif self.reservoir_size:
+            i = self._random.randrange(self.hits)
+            if i < self.reservoir_size:
+                self.reservoir[i] = duration
+
+    def merge(self, other: "Timer"):
+        """Add the durations measured by `other`, the merged reservoir is an approximate sample"""
+        if other.hits == 0:
+            return
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.hits += other.hits
+        self.total += other.total
+        reservoir = self.reservoir + other.reservoir
+        if len(reservoir) > self.reservoir_size:
+            reservoir = self._random.sample(reservoir, self.reservoir_size)
+        self.reservoir = reservoir
+
+    def clear(self):
+        self.hits = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.starts = []
+        self.reservoir = []
+
+    @property
+    def running(self) -> bool:
+        return len(self.starts) > 0
+
+
+class CallNode:
+    """One path of the call tree, aggregated over every call along that path"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.hits = 0
+        self.total = 0
+        self.children: dict[str, "CallNode"] = {}
+
+    def child(self, name: str) -> "CallNode":
+        if name not in self.children:
+            self.children[name] = CallNode(name)
+        return self.children[name]
+
+    def merge(self, other: "CallNode"):
+        self.hits += other.hits
+        self.total += other.total
+        for name, child in other.children.items():
+            self.child(name).merge(child)
+
+    def span(self) -> int:
+        """Width in a flame graph; work merged from parallel workers can outlast the parent"""
+        return max(self.total, sum(child.span() for child in self.children.values()))
+
+    def layout(self, start: int = 0, depth: int = 0):
+        """
+        Yield `(node, depth, start, span)` of this node and its descendants, children placed
+        one after the other from the start of their parent, as in a flame graph
+        """
+        yield self, depth, start, self.span()
+        for child in self.children.values():
+            yield from child.layout(start, depth + 1)
+            start += child.span()
+
+
+class ProfileSnapshot(NamedTuple):
+    """The timers and call tree measured by the profiler of one worker process"""
+
+    worker: str
+    timers: dict[str, Timer]
+    root: CallNode
+
+
+class ProfiledCall:
+    """
+    Picklable wrapper to run `func` in a worker process with the profiler of that process
+    reset, returning `(result, snapshot)` for `Profiler.merge_result` in the parent
+    """
+
+    def __init__(self, func: Callable[..., Any], tracing: bool = False) -> None:
+        self.func = func
+        self.tracing = tracing
+
+    def __call__(self, *args: Any, **kwargs: Any):
+        # forked workers inherit the timers of the parent, which are already counted there
+        profiler.reset()
+        profiler.tracing = self.tracing
+        profiler.start("Worker: task")
+        result = self.func(*args, **kwargs)
+        profiler.stop("Worker: task")
+        return result, profiler.snapshot()
+
+
 class Profiler:
+    """
+    Timers keep running aggregates (hits, total, min, max and a sample of at most
+    `reservoir_size` durations) instead of every start and stop time.
+
+    With `enabled=False`, or the environment variable `TO_TRUST_PROFILE=0` set before
+    `to_trust` is imported, `profile` returns functions unwrapped and `start`/`stop` do
+    nothing, so profiling costs nothing.
+
+    With `tracing` set, timers also build a call tree (e.g. `Simulation: epoch` ->
+    `Act.choose_provider` -> `Act._reputation_of` -> ...) that `show` prints and
+    `write_chrome_trace` / `write_speedscope` export for flame graph viewers.
+    Timers started with `start` have to be stopped innermost first while tracing.
+
+    Worker processes have a profiler of their own: submit `profiler.remote(func)` instead
+    of `func` and pass what the worker returns through `merge_result`, so the timers of
+    every worker add up in the parent and `show` breaks them down per worker.
+    """
+
     s = 1_000_000_000
     ms = 1_000_000
     us = 1_000
     ns = 1
 
-    def __init__(self) -> None:
+    def __init__(
+        self, reservoir_size: int = 0, enabled: bool | None = None, tracing: bool = False
+    ) -> None:
         self.functions = {}
-        self.timers: dict[str, dict[str, list[int] | int]] = {}
+        self.timers: dict[str, Timer] = {}
+        self.reservoir_size = reservoir_size
+        if enabled is None:
+            enabled = os.environ.get("TO_TRUST_PROFILE", "1") != "0"
+        self.enabled = enabled
+        self.tracing = tracing
+        self.root = CallNode("root")
+        self._stack = [self.root]
+        self.workers: dict[str, dict[str, Timer]] = {}
+
+    def timer(self, name: str) -> Timer:
+        if name not in self.timers:
+            self.timers[name] = Timer(self.reservoir_size)
+        return self.timers[name]
 
     def switch(self, name1: str, name2: str):
         self.stop(name1)
         self.start(name2)
 
     def start(self, name: str = "main"):
-        if name not in self.timers:
-            self.timers[name] = {"start": [], "stop": [], "hits": 0}
-
-        self.timers[name]["start"] += [time_ns()]  # type: ignore
+        if not self.enabled:
+            return
+        if self.tracing:
+            self._enter(name)
+        self.timer(name).starts.append(perf_counter_ns())
 
     def stop(self, name: str = "main"):
+        if not self.enabled:
+            return
+        stop = perf_counter_ns()
         if name not in self.timers:
             raise TimerException(f"{name} is not a valid timer")
-
-        self.timers[name]["stop"] += [time_ns()]  # type: ignore
-        self.timers[name]["hits"] += 1  # type: ignore
+        timer = self.timers[name]
+        if not timer.running:
+            raise TimerException(f"{name} timer is not started")
+        duration = stop - timer.starts.pop()
+        timer.add(duration)
+        if self.tracing and len(self._stack) > 1 and self._stack[-1].name == name:
+            self._exit(duration)
 
     def total_time(self, name: str = "main") -> int:
         if name not in self.timers:
             raise TimerException(f"{name} is not a valid timer")
 
-        if len(self.timers[name]["start"]) != self.timers[name]["hits"]:  # type: ignore
+        if self.timers[name].running:
             print(f"[WARNING] - {name} timer is not stopped")
             return 0
-
-        total = 0
-        for start, stop in zip(self.timers[name]["start"], self.timers[name]["stop"]):  # type: ignore
-            total += stop - start  # type: ignore
-        return total  # type: ignore
+        return self.timers[name].total
 
     def profile(self, func):
+        if not self.enabled:
+            return func
 
-        name = f"Function:{func.__name__}"
-        self.timers[name] = {"start": [], "stop": [], "hits": 0}
+        # by qualified name, so an override and the method it extends are timed apart
+        name = func.__qualname__
+        timer = self.timer(f"Function:{name}")
 
+        @wraps(func)
         def new_func(*args: Any, **kwargs: dict[str, Any]):
-            self.start(name)
-            result = func(*args, **kwargs)
-            self.stop(name)
-            return result
+            tracing = self.tracing
+            if tracing:
+                self._enter(name)
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = perf_counter_ns() - start
+                timer.add(duration)
+                if tracing:
+                    self._exit(duration)
 
         return new_func
 
+    def reset(self):
+        """Forget everything measured so far, keeping the timers of profiled functions"""
+        for timer in self.timers.values():
+            timer.clear()
+        self.root = CallNode("root")
+        self._stack = [self.root]
+        self.workers = {}
+
+    def snapshot(self) -> ProfileSnapshot | None:
+        if not self.enabled:
+            return None
+        timers = {name: deepcopy(t) for name, t in self.timers.items() if t.hits > 0}
+        return ProfileSnapshot(f"pid {os.getpid()}", timers, deepcopy(self.root))
+
+    def merge(self, snapshot: ProfileSnapshot | None):
+        """Add the measurements of a worker, the call tree below the current call"""
+        if snapshot is None or not self.enabled:
+            return
+        worker = self.workers.setdefault(snapshot.worker, {})
+        for name, timer in snapshot.timers.items():
+            self.timer(name).merge(timer)
+            worker.setdefault(name, Timer(self.reservoir_size)).merge(timer)
+        self._stack[-1].merge(snapshot.root)
+
+    def remote(self, func: Callable[..., Any]) -> ProfiledCall:
+        return ProfiledCall(func, self.tracing)
+
+    def merge_result(self, value: tuple[Any, ProfileSnapshot | None]) -> Any:
+        """Merge the snapshot a `ProfiledCall` returned with its result, returns the result"""
+        result, snapshot = value
+        self.merge(snapshot)
+        return result
+
+    def _enter(self, name: str):
+        self._stack.append(self._stack[-1].child(name))
+
+    def _exit(self, duration: int):
+        node = self._stack.pop()
+        node.hits += 1
+        node.total += duration
+
+    def _tree_layout(self):
+        """Layout of the call tree below the root, in ns"""
+        self.root.total = sum(child.total for child in self.root.children.values())
+        return [(n, depth - 1, start, span) for n, depth, start, span in self.root.layout()][1:]
+
+    def write_chrome_trace(self, path: str):
+        """Write the call tree as Chrome trace events, for chrome://tracing or Perfetto"""
+        events = [
+            {
+                "name": node.name,
+                "ph": "X",
+                "ts": start / self.us,
+                "dur": span / self.us,
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": {"hits": node.hits, "total": format_time(node.total)},
+            }
+            for node, depth, start, span in self._tree_layout()
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def write_speedscope(self, path: str, name: str = "to_trust"):
+        """Write the call tree as an evented speedscope profile"""
+        frames: dict[str, int] = {}
+        events = []
+        open_nodes: list[tuple[int, int]] = []
+        for node, depth, start, span in self._tree_layout():
+            # close the nodes this one is not nested in
+            while len(open_nodes) > depth:
+                frame, end = open_nodes.pop()
+                events.append({"type": "C", "frame": frame, "at": end})
+            frame = frames.setdefault(node.name, len(frames))
+            events.append({"type": "O", "frame": frame, "at": start})
+            open_nodes.append((frame, start + span))
+        while open_nodes:
+            frame, end = open_nodes.pop()
+            events.append({"type": "C", "frame": frame, "at": end})
+
+        profile = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": frame} for frame in frames]},
+            "profiles": [
+                {
+                    "type": "evented",
+                    "name": name,
+                    "unit": "nanoseconds",
+                    "startValue": 0,
+                    "endValue": self.root.span(),
+                    "events": events,
+                }
+            ],
+            "name": name,
+        }
+        with open(path, "w") as f:
+            json.dump(profile, f)
+
     def result(self):
         all_times: list[tuple[Any, Any]] = list(self.functions.items())  # type: ignore
         for _f, v in all_times:
@@ -93,32 +363,55 @@ class Profiler:
 
         print("\n", "=" * 100, "\n")
         self.print_manual_timers(zero_runners, min_time)
+        if self.workers:
+            print("\n", "=" * 100, "\n")
+            self.print_workers()
+        if self.root.children:
+            print("\n", "=" * 100, "\n")
+            self.print_call_tree(min_time)
         print("\n", "=" * 100, "\n")
 
+    def print_workers(self, hottest: int = 3):
+        print(f"[Worker]  \t|\t[tasks]\t|\t[busy]  \t|\t[hottest functions]")
+        for worker, timers in sorted(self.workers.items()):
+            task = timers.get("Worker: task", Timer())
+            functions = sorted(
+                (t.total, name) for name, t in timers.items() if name.startswith("Function:")
+            )[::-1][:hottest]
+            hot = ", ".join(f"{name[len('Function:'):]} {format_time(t)}" for t, name in functions)
+            print(f"{worker:10}\t|\t{task.hits:7}\t|\t{format_time(task.total):8}\t|\t{hot}")
+
+    def print_call_tree(self, min_time: int = 0):
+        print(f"[Call tree]\t|\t[time]  \t|\t[hit counts]")
+        for node, depth, _, _ in self._tree_layout():
+            if node.total < min_time:
+                continue
+            print(f"{'  ' * depth}{node.name}\t|\t{format_time(node.total):8}\t|\t{node.hits:12}")
+
     def print_manual_timers(self, zero_runners: bool, min_time: int):
         if len(self.timers) == 0:
             return
         longest_key = max(len(str(k)) for k in self.timers)
         print(
-            f"[Timer]{' '*(longest_key-7)}\t|\t[time]  \t|\t[hit counts]\t|\t[time per call]"
+            f"[Timer]{' '*(longest_key-7)}\t|\t[time]  \t|\t[hit counts]\t|\t[time per call]\t|\t[min]   \t|\t[max]"
         )
         for timer in sorted(
             self.timers, key=lambda x: self.total_time(x), reverse=True
         ):
             tt = self.total_time(timer)
             ftt = format_time(tt)
-            hc = self.timers[timer]["hits"]
-            tpc = (
-                "not called"
-                if self.timers[timer]["hits"] == 0
-                else format_time(tt / hc)  # type: ignore
-            )
+            hc = self.timers[timer].hits
+            tpc = "not called" if hc == 0 else format_time(tt / hc)
 
             if not zero_runners and hc == 0:
                 continue
-            if min_time != 0 and (hc == 0 or tt / hc < min_time):  # type: ignore
+            if min_time != 0 and (hc == 0 or tt / hc < min_time):
                 continue
-            print(f"{timer:{max(longest_key,7)}}\t|\t{ftt:8}\t|\t{hc:12}\t|\t{tpc}")
+            fmin = "-" if hc == 0 else format_time(self.timers[timer].min)
+            fmax = "-" if hc == 0 else format_time(self.timers[timer].max)
+            print(
+                f"{timer:{max(longest_key,7)}}\t|\t{ftt:8}\t|\t{hc:12}\t|\t{tpc:15}\t|\t{fmin:8}\t|\t{fmax}"
+            )
 
 
 def format_time(x: int):
@@ -1,10 +1,12 @@
 import os
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sns
 
-from to_trust.settings import scenarios
+from to_trust.results import RESULT_KINDS, ResultStore
+from to_trust.settings import result_store, scenarios
 
 scenario_name_mapping = {
     "collusive_witness_recruited": "Collusive ring\nRecruiting witnesses",
@@ -19,48 +21,42 @@ scenario_name_mapping = {
     "multiple_collusive_rings": "Multiple collusive rings"
 }
 
-if __name__ == '__main__':
-    consumer_utility_files = {}
-    provider_utility_files = {}
-    consumer_mae_files = {}
+def import_csv_result_sets(store: ResultStore, directory: str = '.'):
+    """Add the csv result sets of earlier runs in `directory` that are not in the store yet"""
+    for file_name in os.listdir(directory):
+        for scenario_name in scenarios.keys():
+            for kind in RESULT_KINDS:
+                suffix = f"_{scenario_name}_{kind}_data.csv"
+                if not file_name.endswith(suffix):
+                    continue
+                method = file_name[: -len(suffix)]
+                if not store.entries(method, scenario_name, kind):
+                    store.import_csv(os.path.join(directory, file_name), method, scenario_name, kind)
 
-    for scenario_name in scenarios.keys():
-        consumer_utility_files[scenario_name] = []
-        consumer_mae_files[scenario_name] = []
-        provider_utility_files[scenario_name] = []
 
-    for file_name in os.listdir('.'):
-        for scenario_name in scenarios.keys():
-            if file_name.endswith(scenario_name + "_consumer_utility_data.csv"):
-                consumer_utility_files[scenario_name].append(file_name)
-            elif file_name.endswith(scenario_name + "_provider_utility_data.csv"):
-                provider_utility_files[scenario_name].append(file_name)
-            elif file_name.endswith(scenario_name + "_consumer_mae_data.csv"):
-                consumer_mae_files[scenario_name].append(file_name)
+def epoch_frame(store: ResultStore, scenario_name: str, kind: str, value_column: str, cumulative: bool):
+    frames = []
+    for method in store.methods(scenario_name):
+        values = store.epoch_mean(method, scenario_name, kind)
+        if cumulative:
+            values = values.cumsum()
+        frames.append(pd.DataFrame({
+            value_column: values,
+            'Method': method,
+            'num. interactions': np.arange(values.size),
+        }))
+    return pd.concat(frames, ignore_index=True)
 
-    consumer_utility_data = {}
-    for scenario_name, consumer_utility_file_names in consumer_utility_files.items():
-        consumer_utility_data[scenario_name] = []
-        for file_name in consumer_utility_file_names:
-            consumer_utility_dataframe = pd.read_csv(file_name, index_col=0)
-            consumer_utility_dataframe = consumer_utility_dataframe.groupby('simulation_run_index').mean().cumsum()
-            consumer_utility_dataframe.drop(['overall_run_index', 'consumer_index'], axis=1, inplace=True)
-            consumer_utility_dataframe['Method'] = file_name.split('_')[0]
-            consumer_utility_dataframe['num. interactions'] = consumer_utility_dataframe.index
-            consumer_utility_data[scenario_name].append(consumer_utility_dataframe)
-        consumer_utility_data[scenario_name] = pd.concat(consumer_utility_data[scenario_name], ignore_index=True)
 
+if __name__ == '__main__':
+    store = ResultStore(result_store)
+    import_csv_result_sets(store)
+
+    consumer_utility_data = {}
     consumer_mae_data = {}
-    for scenario_name, consumer_mae_file_names in consumer_mae_files.items():
-        consumer_mae_data[scenario_name] = []
-        for file_name in consumer_mae_file_names:
-            consumer_mae_dataframe = pd.read_csv(file_name, index_col=0)
-            consumer_mae_dataframe = consumer_mae_dataframe.groupby('simulation_run_index').mean()
-            consumer_mae_dataframe.drop(['overall_run_index', 'consumer_index'], axis=1, inplace=True)
-            consumer_mae_dataframe['Method'] = file_name.split('_')[0]
-            consumer_mae_dataframe['num. interactions'] = consumer_mae_dataframe.index
-            consumer_mae_data[scenario_name].append(consumer_mae_dataframe)
-        consumer_mae_data[scenario_name] = pd.concat(consumer_mae_data[scenario_name], ignore_index=True)
+    for scenario_name in scenarios.keys():
+        consumer_utility_data[scenario_name] = epoch_frame(store, scenario_name, 'consumer_utility', 'utility', True)
+        consumer_mae_data[scenario_name] = epoch_frame(store, scenario_name, 'consumer_mae', 'mae', False)
 
     hue_order = list(consumer_utility_data.values())[0]['Method'].unique().tolist()
     for scenario_name in scenarios: